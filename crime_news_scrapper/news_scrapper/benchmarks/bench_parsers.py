@@ -0,0 +1,273 @@
+"""
+This module provides an offline benchmark for the parsers. Recorded front pages, AJAX JSON
+and story pages from the `fixtures` directory are replayed as `scrapy.http.HtmlResponse` and
+`scrapy.http.TextResponse` objects through the very same callback chain the spider runs,
+without any network access.
+
+For every scenario it reports the items per second, the latency percentiles of every
+callback and the memory allocated per item. The results can be saved as a baseline and a
+later run can be compared against it, failing on regressions.
+
+How To Use This Module
+======================
+
+1. Move to the scrapy project directory:
+   ``cd crime_news_scrapper/news_scrapper``
+
+2. Run the benchmark:
+   ``python benchmarks/bench_parsers.py --iterations 200``
+
+3. Save a baseline and compare a later run against it:
+   ``python benchmarks/bench_parsers.py --save baseline.json``
+   ``python benchmarks/bench_parsers.py --baseline baseline.json --tolerance 0.25``
+"""
+
+import argparse
+from collections import defaultdict
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault(
+    "CUSTOM_CONFIG_PATH", os.path.join(os.path.dirname(PROJECT_DIR), "config.yaml")
+)
+
+# pylint: disable=wrong-import-position
+from scrapy import Item  # noqa: E402
+from scrapy.http import HtmlResponse, Request, TextResponse  # noqa: E402
+
+from news_scrapper.parsers.registry import ParserRegistry  # noqa: E402
+
+
+def read_fixture(name: str) -> bytes:
+    """
+    :param name: file name of a recorded response in the fixtures directory
+    :return: content of the recorded response
+    """
+    with open(os.path.join(FIXTURES_DIR, name), mode="rb") as fixture:
+        return fixture.read()
+
+
+class CallbackTimer:
+    """
+    Records the latency of every callback call, the latency includes
+    consuming the whole iterable returned by the callback.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+
+    def run(self, callback: Callable, response: TextResponse, **kwargs) -> list:
+        """
+        Runs a callback for a response and returns everything it yielded.
+        :param callback: parser callback
+        :param response: recorded response
+        :return: list of the yielded `Request` and `Item` objects
+        """
+        started = time.perf_counter()
+        outputs = list(callback(response, **kwargs) or [])
+        self.latencies[callback.__name__].append(time.perf_counter() - started)
+        return outputs
+
+
+def replay_story_requests(
+    timer: CallbackTimer, outputs: Iterable[Any], story_body: bytes, url_prefix: str
+) -> int:
+    """
+    Answers every story request yielded by a listing callback with the recorded
+    story page and runs the story callback on it.
+    :return: number of items scraped from the listing and the story pages
+    """
+    items = 0
+    for output in outputs:
+        if isinstance(output, Item):
+            items += 1
+        elif isinstance(output, Request) and output.url.startswith(url_prefix):
+            response = HtmlResponse(
+                url=output.url, body=story_body, encoding="utf-8", request=output
+            )
+            items += sum(
+                isinstance(story_output, Item)
+                for story_output in timer.run(output.callback, response, **output.cb_kwargs)
+            )
+    return items
+
+
+def india_today_scenario(timer: CallbackTimer, parser: Any) -> int:
+    """Replays the front page, one load more AJAX page and all their story pages"""
+    front_page = HtmlResponse(
+        url="https://www.indiatoday.in/crime",
+        body=read_fixture("india_today_front_page.html"),
+        encoding="utf-8",
+    )
+    story = read_fixture("india_today_story.html")
+    outputs = timer.run(parser.parse_front_page, front_page)
+    items = replay_story_requests(timer, outputs, story, "https://www.indiatoday.in/crime/story")
+    ajax_request = next(
+        output for output in outputs if isinstance(output, Request) and "loadmore" in output.url
+    )
+    load_more = TextResponse(
+        url=ajax_request.url,
+        body=read_fixture("india_today_load_more.json"),
+        encoding="utf-8",
+        request=ajax_request,
+    )
+    outputs = timer.run(ajax_request.callback, load_more, **ajax_request.cb_kwargs)
+    return items + replay_story_requests(timer, outputs, story, "https://www.indiatoday.in/cities")
+
+
+def indian_express_scenario(timer: CallbackTimer, parser: Any) -> int:
+    """Replays a listing page, as rendered by Splash and as plain HTTP, and its story pages"""
+    listing = read_fixture("indian_express_listing.html")
+    story = read_fixture("indian_express_story.html")
+    rendered = HtmlResponse(
+        url="https://indianexpress.com/about/crime-news/", body=listing, encoding="utf-8"
+    )
+    # Splash responses carry the values returned by the lua script as `data`
+    rendered.data = {"click_count": 0}
+    # The listing urls are seen again by every iteration, reset the in-run dedup
+    parser.seen_urls.clear()
+    outputs = timer.run(parser.parse_data, rendered)
+    items = replay_story_requests(timer, outputs, story, "https://indianexpress.com/article")
+    paged = HtmlResponse(
+        url="https://indianexpress.com/about/crime-news/",
+        body=listing,
+        encoding="utf-8",
+        request=Request(url="https://indianexpress.com/about/crime-news/"),
+    )
+    parser.seen_urls.clear()
+    outputs = timer.run(parser.parse_listing_page, paged)
+    return items + replay_story_requests(timer, outputs, story, "https://indianexpress.com/article")
+
+
+SCENARIOS = {
+    "indiatoday": india_today_scenario,
+    "indianexpress": indian_express_scenario,
+}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    :param values: measured values
+    :param fraction: percentile as a fraction, e.g. 0.95
+    :return: the value at the given percentile (nearest rank)
+    """
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def run_benchmark(site: str, iterations: int, warmup: int) -> dict:
+    """
+    Runs a scenario `iterations` times after `warmup` unmeasured runs.
+    :param site: name of the site whose parser is benchmarked
+    :param iterations: number of measured runs
+    :param warmup: number of runs before measuring
+    :return: dict of the results
+    """
+    parser = ParserRegistry().get(site=site)
+    scenario = SCENARIOS[site]
+    for _ in range(warmup):
+        scenario(CallbackTimer(), parser)
+
+    timer = CallbackTimer()
+    gc.collect()
+    started = time.perf_counter()
+    items = sum(scenario(timer, parser) for _ in range(iterations))
+    elapsed = time.perf_counter() - started
+
+    # Memory is measured separately as tracing slows down the measured runs
+    gc.collect()
+    tracemalloc.start()
+    traced_items = scenario(CallbackTimer(), parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "items": items,
+        "items_per_sec": items / elapsed if elapsed else 0.0,
+        "peak_bytes_per_item": peak / traced_items if traced_items else 0.0,
+        "callbacks": {
+            name: {
+                "calls": len(latencies),
+                "p50_ms": statistics.median(latencies) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+            }
+            for name, latencies in timer.latencies.items()
+        },
+    }
+
+
+def print_results(results: dict) -> None:
+    """Prints the results as a table"""
+    for site, result in results.items():
+        print(
+            f"{site}: {result['items']} items, {result['items_per_sec']:.1f} items/sec, "
+            f"{result['peak_bytes_per_item'] / 1024:.1f} KiB peak memory per item"
+        )
+        for name, callback in result["callbacks"].items():
+            print(
+                f"  {name:<22} calls={callback['calls']:<6} p50={callback['p50_ms']:.3f}ms "
+                f"p95={callback['p95_ms']:.3f}ms p99={callback['p99_ms']:.3f}ms"
+            )
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the results with a baseline.
+    :param tolerance: allowed relative slowdown, e.g. 0.25 for 25%
+    :return: list of the regressions found, empty if none
+    """
+    regressions = []
+    for site, result in results.items():
+        if site not in baseline:
+            continue
+        expected = baseline[site]["items_per_sec"]
+        if result["items_per_sec"] < expected * (1 - tolerance):
+            regressions.append(
+                f"{site}: {result['items_per_sec']:.1f} items/sec, baseline {expected:.1f}"
+            )
+        for name, callback in result["callbacks"].items():
+            expected_p95 = baseline[site]["callbacks"].get(name, {}).get("p95_ms")
+            if expected_p95 and callback["p95_ms"] > expected_p95 * (1 + tolerance):
+                regressions.append(
+                    f"{site}.{name}: p95 {callback['p95_ms']:.3f}ms, baseline {expected_p95:.3f}ms"
+                )
+    return regressions
+
+
+def main() -> int:
+    """Command line entry point, returns the exit code"""
+    arg_parser = argparse.ArgumentParser(description="Offline benchmark of the parsers")
+    arg_parser.add_argument("--sites", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    arg_parser.add_argument("--iterations", type=int, default=100)
+    arg_parser.add_argument("--warmup", type=int, default=5)
+    arg_parser.add_argument("--save", help="write the results as json to this file")
+    arg_parser.add_argument("--baseline", help="json results of an earlier run to compare with")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25)
+    args = arg_parser.parse_args()
+
+    results = {site: run_benchmark(site, args.iterations, args.warmup) for site in args.sites}
+    print_results(results)
+    if args.save:
+        with open(args.save, mode="w", encoding="utf-8") as result_file:
+            json.dump(results, result_file, indent=2)
+    if args.baseline:
+        with open(args.baseline, mode="r", encoding="utf-8") as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Replays the recorded fixtures of the benchmark through the parsers once and checks the
+number of scraped items, so that a parser change which loses stories fails the tests
+instead of showing up as a faster benchmark.
+
+How To Use This Module
+======================
+
+Move to the scrapy project directory and run:
+   ``python -m pytest benchmarks``
+"""
+
+import pytest
+
+from bench_parsers import (
+    SCENARIOS,
+    CallbackTimer,
+    ParserRegistry,
+    find_regressions,
+    run_benchmark,
+)
+
+# Stories of the front page and of one load more page, and of the listing page as rendered
+# by Splash and as plain HTTP
+EXPECTED_ITEMS = {
+    "indiatoday": 47,
+    "indianexpress": 50,
+}
+
+
+@pytest.mark.parametrize("site", sorted(SCENARIOS))
+def test_scenario_items(site):
+    parser = ParserRegistry().get(site=site)
+    timer = CallbackTimer()
+    # The scenarios are replayed repeatedly by the benchmark, a rerun must scrape the same
+    assert SCENARIOS[site](timer, parser) == EXPECTED_ITEMS[site]
+    assert SCENARIOS[site](timer, parser) == EXPECTED_ITEMS[site]
+    assert all(timer.latencies.values())
+
+
+def test_run_benchmark():
+    result = run_benchmark(site="indiatoday", iterations=2, warmup=0)
+    assert result["items"] == 2 * EXPECTED_ITEMS["indiatoday"]
+    assert result["items_per_sec"] > 0
+    assert {"parse_front_page", "parse_more_content", "parse_story"} <= set(result["callbacks"])
+
+
+def test_find_regressions():
+    baseline = {
+        "indiatoday": {"items_per_sec": 100.0, "callbacks": {"parse_story": {"p95_ms": 1.0}}}
+    }
+    results = {"indiatoday": {"items_per_sec": 70.0, "callbacks": {"parse_story": {"p95_ms": 1.2}}}}
+    regressions = find_regressions(results=results, baseline=baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("indiatoday:")
+    assert not find_regressions(results=results, baseline=baseline, tolerance=0.5)
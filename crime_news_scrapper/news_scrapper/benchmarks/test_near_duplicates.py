@@ -0,0 +1,120 @@
+"""
+Checks the SimHash fingerprints and the near-duplicate index, so that the numpy and the pure
+python code paths keep giving exactly the same results.
+
+How To Use This Module
+======================
+
+Move to the scrapy project directory and run:
+   ``python -m pytest benchmarks``
+"""
+
+import random
+
+import pytest
+
+from news_scrapper import near_duplicates
+from news_scrapper.near_duplicates import (
+    MASK,
+    NearDuplicateIndex,
+    simhash,
+    to_signed,
+    to_unsigned,
+)
+
+TEXTS = [
+    ("Man held for murder in Delhi", "Police arrested a man in the city on Monday"),
+    ("Two killed in a road rage incident", "The accused fled the spot, police said"),
+    ("Gold worth Rs 2 crore seized at the airport", None),
+    ("word " * 40, "word word other"),
+]
+
+
+def flip_bits(fingerprint: int, count: int, rng: random.Random, lowest: int = 0) -> int:
+    """:return: the fingerprint with `count` distinct random bits flipped, from bit `lowest` up"""
+    for bit in rng.sample(range(lowest, 64), count):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+@pytest.mark.parametrize("title, description", TEXTS)
+def test_simhash_numpy_matches_python(title, description):
+    pytest.importorskip("numpy")
+    fingerprint = simhash(title, description)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(near_duplicates, "np", None)
+        assert simhash(title, description) == fingerprint
+
+
+def test_simhash_normalizes_the_text():
+    assert simhash("Man held, for MURDER!", None) == simhash("man held for murder", "")
+    assert simhash(None, "") == 0
+    assert simhash("a ! ?", None) == 0
+    assert 0 < simhash(*TEXTS[0]) <= MASK
+
+
+@pytest.mark.parametrize("fingerprint", [1, 2**62, 2**63 - 1, 2**63, 2**63 + 1, MASK])
+def test_signed_round_trip(fingerprint):
+    signed = to_signed(fingerprint)
+    assert -(2**63) <= signed < 2**63
+    assert to_unsigned(signed) == fingerprint
+
+
+def test_bands_cover_all_the_bits():
+    for max_distance in range(8):
+        index = NearDuplicateIndex(max_distance=max_distance)
+        covered = 0
+        for shift, mask in index.bands:
+            assert not covered & mask << shift
+            covered |= mask << shift
+        assert covered == MASK
+
+
+def test_find_within_max_distance():
+    rng = random.Random(5)
+    index = NearDuplicateIndex(max_distance=3)
+    fingerprints = [rng.getrandbits(64) | 1 for _ in range(200)]
+    index.add_many((fingerprint, f"u{i}", "a") for i, fingerprint in enumerate(fingerprints))
+    assert len(index) == 200
+    for i, fingerprint in enumerate(fingerprints):
+        for distance in range(4):
+            assert index.find(flip_bits(fingerprint, distance, rng), url="new") == (
+                f"u{i}",
+                distance,
+            )
+        assert index.find(flip_bits(fingerprint, 4, rng), url="new") is None
+        # A story is not a near-duplicate of itself
+        assert index.find(fingerprint, url=f"u{i}") is None
+    assert index.find(0) is None
+
+
+def test_find_closest_and_cross_source_only():
+    index = NearDuplicateIndex(max_distance=3, cross_source_only=True)
+    fingerprint = 0xF0F0F0F0F0F0F0F0
+    index.add(fingerprint=fingerprint ^ 0b1, url="same", source="a")
+    index.add(fingerprint=fingerprint ^ 0b11, url="other", source="b")
+    index.add(fingerprint=0, url="empty", source="b")
+    assert len(index) == 2
+    assert index.find(fingerprint, url="new", source="a") == ("other", 2)
+    assert index.find(fingerprint, url="new", source="c") == ("same", 1)
+
+
+def test_shared_buckets_numpy_matches_python():
+    pytest.importorskip("numpy")
+    if not near_duplicates.HAS_BITWISE_COUNT:
+        pytest.skip("numpy >= 2.0 is needed to compare the fingerprints")
+    rng = random.Random(7)
+    base = rng.getrandbits(64)
+    index = NearDuplicateIndex(max_distance=3)
+    # Same first band, so that all the stories share a bucket and the array buckets are used
+    index.add_many(
+        (flip_bits(base, rng.randrange(4), rng, lowest=16), f"u{i}", "a")
+        for i in range(NearDuplicateIndex.VECTORIZE_FROM * 4)
+    )
+    assert any(not isinstance(bucket, int) for bucket in index.buckets.values())
+    queries = [flip_bits(base, rng.randrange(4), rng) for _ in range(50)] + list(index.fingerprints)
+    vectorized = [index._candidates(query) for query in queries]
+    assert sum(map(len, vectorized)) > len(queries)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(near_duplicates, "HAS_BITWISE_COUNT", False)
+        assert [index._candidates(query) for query in queries] == vectorized
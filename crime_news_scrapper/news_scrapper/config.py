@@ -1,21 +1,295 @@
 """
 This module provides a :py:func:`load_config`
-that can be used to load the yaml config or to read yaml in python dict object.
+that can be used to load the yaml config or to read yaml in python dict object,
+and a :py:func:`get_config` that loads and validates the application config
+only once per process into immutable (frozen) dataclasses shared by all the components.
 
 How To Use This Module
 ======================
 
-Import the :py:func:`load_config`:
-   ``from config import load_config``
+Import the :py:func:`get_config`:
+   ``from config import get_config``
+
+Use the config sections as::
+   get_config().database.table_name
 
 """
 
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
 import os
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Mapping
 import yaml
 
 from scrapy.utils.project import get_project_settings
 
+from news_scrapper.const import RequestType, StorageBackend
+
+
+class ConfigError(ValueError):
+    """Raised when the config file is missing a required value or has an invalid one"""
+
+
+@dataclass(frozen=True)
+class LogConfig:
+    """Logging config common to all the sections"""
+
+    log_level: str = "INFO"
+    file_name: str = "news_scrapper.log"
+
+    def __post_init__(self):
+        if self.log_level.upper() not in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+            raise ConfigError(f"Invalid log_level: {self.log_level}")
+
+
+@dataclass(frozen=True)
+class DownloadSlotConfig:
+    """Download concurrency and delay of a type of requests (:py:class:`RequestType`) of a site"""
+
+    request_type: str
+    concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 16
+    delay: float = 0.0
+    # Download timeout of the requests, in seconds, 0 for the `DOWNLOAD_TIMEOUT` setting
+    timeout: float = 0.0
+
+    def __post_init__(self):
+        if self.request_type not in {request_type.value for request_type in RequestType}:
+            raise ConfigError(f"Invalid request type of a download slot: {self.request_type}")
+        if not 1 <= self.min_concurrency <= self.concurrency <= self.max_concurrency:
+            raise ConfigError(
+                f"The concurrency of the {self.request_type} download slot must be at least 1 "
+                f"and between min_concurrency and max_concurrency"
+            )
+        if self.delay < 0 or self.timeout < 0:
+            raise ConfigError(
+                f"delay and timeout must not be negative: {self.delay}, {self.timeout}"
+            )
+
+
+@dataclass(frozen=True)
+class SiteConfig:
+    """Config of a single site to crawl, keyed by its domain in the `spider` section"""
+
+    domain: str
+    start_url: str
+    allow: str = ""
+    unique: bool = True
+    follow: bool = True
+    # Discovery of the stories by the sitemap spider
+    sitemap_url: str = ""
+    sitemap_follow: str = ""
+    sitemap_allow: str = ""
+    feed_url: str = ""
+    download_slots: tuple[DownloadSlotConfig, ...] = ()
+
+
+@dataclass(frozen=True)
+class SpiderConfig(LogConfig):
+    """Config of the `spider` section"""
+
+    file_name: str = "crime_news_crawler.log"
+    sites_to_crawl: tuple[str, ...] = ()
+    sites: tuple[SiteConfig, ...] = ()
+    partial_story_download: bool = True
+    job_dir: str = ""
+
+    def __post_init__(self):
+        super().__post_init__()
+        if not self.sites_to_crawl:
+            raise ConfigError(
+                "No any sites to crawl, there should be at least one site to start a crawl"
+            )
+
+
+@dataclass(frozen=True)
+class IndiaTodayParserConfig(LogConfig):
+    """Config of the `india_today_parser` section"""
+
+    file_name: str = "india_today.log"
+    load_more_window: int = 1
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.load_more_window < 1:
+            raise ConfigError(f"load_more_window must be at least 1: {self.load_more_window}")
+
+
+@dataclass(frozen=True)
+class IndianExpressParserConfig(LogConfig):
+    """Config of the `indian_express_parser` section"""
+
+    file_name: str = "indian_express.log"
+    pagination: str = "splash"
+    max_pages: int = 0
+    max_clicks: int = 0
+    splash_timeout: int = 600
+    splash_fallback: bool = True
+    feed_url: str = ""
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.pagination not in ("direct", "splash"):
+            raise ConfigError(f"pagination must be either 'direct' or 'splash': {self.pagination}")
+
+
+@dataclass(frozen=True)
+class DatabaseConfig(LogConfig):
+    """Config of the `database` section"""
+
+    backend: str = "postgresql"
+    db_name: str = ""
+    username: str = ""
+    host: str = "localhost"
+    port: str = "5432"
+    table_name: str = "crimedata"
+    on_conflict: str = "nothing"
+    full_text_index: bool = False
+    pool_size: int = 2
+    max_retries: int = 5
+    retry_backoff: float = 1.0
+    health_check_interval: float = 30
+    output_dir: str = "output"
+    compression_level: int = 6
+    row_group_size: int = 10000
+    file_name: str = "database.log"
+
+    def __post_init__(self):
+        super().__post_init__()
+        backends = [backend.name.lower() for backend in StorageBackend]
+        if self.backend not in backends:
+            raise ConfigError(f"backend must be one of {', '.join(backends)}: {self.backend}")
+        if self.backend == "postgresql" and not self.db_name:
+            raise ConfigError("database.db_name is required")
+        if self.pool_size < 1:
+            raise ConfigError(f"pool_size must be at least 1: {self.pool_size}")
+        if self.max_retries < 0:
+            raise ConfigError(f"max_retries must not be negative: {self.max_retries}")
+        if not 1 <= self.compression_level <= 9:
+            raise ConfigError(
+                f"compression_level must be between 1 and 9: {self.compression_level}"
+            )
+        if self.row_group_size < 1:
+            raise ConfigError(f"row_group_size must be at least 1: {self.row_group_size}")
+        if self.on_conflict not in ("nothing", "update"):
+            raise ConfigError(
+                f"on_conflict must be either 'nothing' or 'update': {self.on_conflict}"
+            )
+
+
+@dataclass(frozen=True)
+class PipelineConfig(LogConfig):
+    """Config of the `pipeline` section"""
+
+    file_name: str = "pipeline.log"
+    batch_size: int = 1
+    flush_interval: float = 0
+    write_mode: str = "sync"
+    max_pending_batches: int = 4
+    writer_threads: int = 1
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.batch_size < 1:
+            raise ConfigError(f"batch_size must be at least 1: {self.batch_size}")
+        if self.writer_threads < 1:
+            raise ConfigError(f"writer_threads must be at least 1: {self.writer_threads}")
+        if self.write_mode not in ("sync", "async"):
+            raise ConfigError(f"write_mode must be either 'sync' or 'async': {self.write_mode}")
+
+
+@dataclass(frozen=True)
+class SeenIndexConfig:
+    """Config of the `seen_index` section"""
+
+    enabled: bool = False
+    path: str = "seen_urls.sqlite3"
+    preload_from_database: bool = True
+
+
+@dataclass(frozen=True)
+class IncrementalConfig:
+    """Config of the `incremental` section"""
+
+    enabled: bool = False
+    watermark_size: int = 20
+
+
+@dataclass(frozen=True)
+class NearDuplicatesConfig:
+    """Config of the `near_duplicates` section"""
+
+    enabled: bool = False
+    max_distance: int = 3
+    cross_source_only: bool = False
+
+    def __post_init__(self):
+        if not 0 <= self.max_distance < 32:
+            raise ConfigError(f"max_distance must be between 0 and 31: {self.max_distance}")
+
+
+@dataclass(frozen=True)
+class ThrottleConfig:
+    """Config of the `throttle` section"""
+
+    adaptive: bool = True
+    max_error_rate: float = 0.1
+    latency_tolerance: float = 2.0
+    window: int = 10
+
+    def __post_init__(self):
+        if not 0 <= self.max_error_rate <= 1:
+            raise ConfigError(f"max_error_rate must be between 0 and 1: {self.max_error_rate}")
+        if self.latency_tolerance < 1:
+            raise ConfigError(f"latency_tolerance must be at least 1: {self.latency_tolerance}")
+        if self.window < 1:
+            raise ConfigError(f"window must be at least 1: {self.window}")
+
+
+@dataclass(frozen=True)
+class HttpCacheConfig:
+    """Config of the `http_cache` section"""
+
+    enabled: bool = False
+    path: str = "httpcache.sqlite3"
+    story_ttl: int = 720
+    listing_max_age: int = 0
+
+    def __post_init__(self):
+        if self.story_ttl < 0:
+            raise ConfigError(f"story_ttl must not be negative: {self.story_ttl}")
+        if self.listing_max_age < 0:
+            raise ConfigError(f"listing_max_age must not be negative: {self.listing_max_age}")
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """The whole application config, one attribute per section of the config file"""
+
+    spider: SpiderConfig
+    database: DatabaseConfig
+    pipeline: PipelineConfig = field(default_factory=PipelineConfig)
+    india_today_parser: IndiaTodayParserConfig = field(default_factory=IndiaTodayParserConfig)
+    indian_express_parser: IndianExpressParserConfig = field(
+        default_factory=IndianExpressParserConfig
+    )
+    seen_index: SeenIndexConfig = field(default_factory=SeenIndexConfig)
+    incremental: IncrementalConfig = field(default_factory=IncrementalConfig)
+    near_duplicates: NearDuplicatesConfig = field(default_factory=NearDuplicatesConfig)
+    throttle: ThrottleConfig = field(default_factory=ThrottleConfig)
+    http_cache: HttpCacheConfig = field(default_factory=HttpCacheConfig)
+    # The raw sections, e.g. for the parsers registered through entry points
+    raw: Mapping[str, Any] = field(default_factory=dict)
+
+    def section(self, name: str) -> Mapping[str, Any]:
+        """
+        :param name: name of a section of the config file
+        :return: read-only raw mapping of the section, empty if not present
+        """
+        return MappingProxyType(self.raw.get(name) or {})
+
 
 def get_config_path() -> str:
     """
@@ -23,10 +297,10 @@ def get_config_path() -> str:
     to get the path for custom config file.
     :return str: custom config file path
     """
-    settings = get_project_settings()
     if os.getenv("CUSTOM_CONFIG_PATH"):
         yaml_config_path = os.getenv("CUSTOM_CONFIG_PATH")
     else:
+        settings = get_project_settings()
         yaml_config_path = settings.get("CUSTOM_CONFIG_PATH")
     return yaml_config_path
 
@@ -40,3 +314,114 @@ def load_config(config_path: str) -> Any:
     """
     with open(file=config_path, mode="r", encoding="utf-8") as conf_file:
         return yaml.safe_load(conf_file)
+
+
+def _coerce(value: Any, field_type: Any, name: str) -> Any:
+    """
+    Converts a yaml value to the type of a config field, raises :py:class:`ConfigError`
+    if it can not be converted.
+    """
+    if field_type is bool:
+        if not isinstance(value, bool):
+            raise ConfigError(f"{name} must be either True or False: {value}")
+        return value
+    if field_type in (int, float):
+        if isinstance(value, bool):
+            raise ConfigError(f"{name} must be a number: {value}")
+        try:
+            return field_type(value)
+        except (TypeError, ValueError) as err:
+            raise ConfigError(f"{name} must be a number: {value}") from err
+    if field_type is str:
+        if isinstance(value, (dict, list)):
+            raise ConfigError(f"{name} must be a string: {value}")
+        return str(value)
+    return value
+
+
+def _build(cls: type, section: str, values: Mapping[str, Any], **extra) -> Any:
+    """
+    Builds a config dataclass from a section of the config file, unknown keys
+    are rejected so that typos fail fast.
+    """
+    if not isinstance(values, Mapping):
+        raise ConfigError(f"{section} must be a mapping: {values}")
+    known = {config_field.name: config_field for config_field in fields(cls)}
+    unknown = set(values) - set(known)
+    if unknown:
+        raise ConfigError(f"Unknown keys in {section}: {', '.join(sorted(unknown))}")
+    kwargs = {
+        key: _coerce(value, known[key].type, f"{section}.{key}") for key, value in values.items()
+    }
+    try:
+        return cls(**kwargs, **extra)
+    except TypeError as err:
+        raise ConfigError(f"Invalid {section} config: {err}") from err
+
+
+def _build_site(domain: str, values: Mapping[str, Any]) -> SiteConfig:
+    """
+    Builds the config of a site from its mapping in the `spider` section, along with
+    its `download_slots` mapping of the request types to their download slot configs.
+    """
+    if not isinstance(values, Mapping):
+        raise ConfigError(f"spider.{domain} must be a mapping: {values}")
+    values = dict(values)
+    slots = values.pop("download_slots", None) or {}
+    if not isinstance(slots, Mapping):
+        raise ConfigError(f"spider.{domain}.download_slots must be a mapping: {slots}")
+    download_slots = tuple(
+        _build(
+            DownloadSlotConfig,
+            f"spider.{domain}.download_slots.{request_type}",
+            slot or {},
+            request_type=request_type,
+        )
+        for request_type, slot in slots.items()
+    )
+    return _build(
+        SiteConfig, f"spider.{domain}", values, domain=domain, download_slots=download_slots
+    )
+
+
+def parse_config(config: Mapping[str, Any]) -> AppConfig:
+    """
+    Validates the config read from the config file and converts it to an :py:class:`AppConfig`.
+    :param config: config read by :py:func:`load_config`
+    :return: :py:class:`AppConfig` object
+    """
+    if not isinstance(config, Mapping):
+        raise ConfigError("The config file must hold a mapping of sections")
+    spider = dict(config.get("spider") or {})
+    sites = tuple(
+        _build_site(domain=domain, values=spider.pop(domain))
+        for domain in [key for key, value in spider.items() if isinstance(value, Mapping)]
+    )
+    spider["sites_to_crawl"] = tuple(spider.get("sites_to_crawl") or ())
+    sections = {
+        "spider": _build(SpiderConfig, "spider", spider, sites=sites),
+        "database": _build(DatabaseConfig, "database", config.get("database") or {}),
+    }
+    for name, cls in (
+        ("pipeline", PipelineConfig),
+        ("india_today_parser", IndiaTodayParserConfig),
+        ("indian_express_parser", IndianExpressParserConfig),
+        ("seen_index", SeenIndexConfig),
+        ("incremental", IncrementalConfig),
+        ("near_duplicates", NearDuplicatesConfig),
+        ("throttle", ThrottleConfig),
+        ("http_cache", HttpCacheConfig),
+    ):
+        if config.get(name) is not None:
+            sections[name] = _build(cls, name, config[name])
+    return AppConfig(**sections, raw=MappingProxyType(dict(config)))
+
+
+@lru_cache(maxsize=None)
+def get_config() -> AppConfig:
+    """
+    Loads and validates the config file only once per process, all the
+    subsequent calls return the same :py:class:`AppConfig` object.
+    :return: :py:class:`AppConfig` object
+    """
+    return parse_config(load_config(config_path=get_config_path()))
@@ -42,3 +42,24 @@ class ClassMapping(Enum):
 
     INDIATODAYPARSER = "news_scrapper.parsers.india_today_parser.IndiaTodayParser"
     INDIANEXPRESSPARSER = "news_scrapper.parsers.indian_express_parser.IndianExpressParser"
+
+
+class StorageBackend(Enum):
+    """Enum for storage backend (`database.backend` in the config) to its class mapping"""
+
+    POSTGRESQL = "news_scrapper.database.postgresql.PostgreSQLDB"
+    JSONL = "news_scrapper.database.jsonl.JSONLinesDB"
+    PARQUET = "news_scrapper.database.parquet.ParquetDB"
+
+
+class RequestType(Enum):
+    """
+    Enum for the types of requests (`request_type` in the request meta), each type of requests
+    of a site is downloaded in its own download slot
+    """
+
+    LISTING = "listing"
+    AJAX = "ajax"
+    SPLASH = "splash"
+    STORY = "story"
+    FEED = "feed"
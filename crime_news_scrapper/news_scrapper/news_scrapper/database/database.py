@@ -1,16 +1,53 @@
 """
 This module defines base implementation for any database that will be used
-to store the data.
+to store the data, and resolves the implementation (storage backend) selected
+by `database.backend` in the config.
+
+How To Use This Module
+======================
+
+For example:
+1. Import the function :py:func:`get_database_class`:
+   ``from news_scrapper.database.database import get_database_class``.
+
+2. Create the database object of the configured backend:
+   db = get_database_class(backend=db_config.backend).from_config(db_config)
 """
 
 from abc import abstractmethod
+from dataclasses import dataclass
+import importlib
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
-from config import get_config_path, load_config
+from config import DatabaseConfig, get_config
+from news_scrapper.const import StorageBackend
 from news_scrapper.log import set_up_logging
 
 
+@dataclass
+class WriteResult:
+    """
+    Counts of rows inserted, updated, skipped (already stored and unchanged),
+    failed and linked (as near-duplicates of stored rows) by a write operation.
+    """
+
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    linked: int = 0
+
+    def __add__(self, other: "WriteResult") -> "WriteResult":
+        return WriteResult(
+            inserted=self.inserted + other.inserted,
+            updated=self.updated + other.updated,
+            skipped=self.skipped + other.skipped,
+            failed=self.failed + other.failed,
+            linked=self.linked + other.linked,
+        )
+
+
 class DataBase:
     """
     A simple abstract database class that can be derived
@@ -25,15 +62,14 @@ class DataBase:
         host: Optional[str] = None,
         port: Optional[str] = None,
         table: Optional[str] = None,
+        on_conflict: str = "nothing",
     ):
         """Init method"""
-        self.log = logging.getLogger()
-        config_path = get_config_path()
-        config = load_config(config_path=config_path)
-        db_config = config.get("database", {})
-        log_level = db_config.get("log_level", "INFO")
-        log_path = db_config.get("file_name", "database.log")
-        set_up_logging(logger=self.log, log_level=log_level, file_name=log_path)
+        self.log = logging.getLogger(name="news_scrapper.database")
+        db_config = get_config().database
+        set_up_logging(
+            logger=self.log, log_level=db_config.log_level, file_name=db_config.file_name
+        )
         self.db_name = db_name
         self.connection = None
         self.db_username = username
@@ -41,6 +77,19 @@ class DataBase:
         self.db_host = host
         self.db_port = port
         self.table = table
+        if on_conflict not in ("nothing", "update"):
+            raise ValueError(f"on_conflict must be either 'nothing' or 'update': {on_conflict}")
+        # Whether an already stored row (same url) is left as it is or updated
+        self.on_conflict = on_conflict
+
+    @classmethod
+    def from_config(cls, db_config: DatabaseConfig) -> "DataBase":
+        """
+        Creates the database object from the `database` section of the config.
+        :param db_config: `DatabaseConfig` object
+        :return: database object
+        """
+        raise NotImplementedError
 
     @abstractmethod
     def connect(self):
@@ -48,11 +97,53 @@ class DataBase:
         raise NotImplementedError
 
     @abstractmethod
-    def add(self, params: dict) -> None:
+    def migrate(self) -> None:
+        """Creates or upgrades the schema to store the data in, run at startup"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, params: dict) -> WriteResult:
         """Execute an INSERT operation on a database table"""
         raise NotImplementedError
 
+    @abstractmethod
+    def add_many(self, rows: list[dict]) -> WriteResult:
+        """
+        Execute a single multi-row INSERT operation on a database table, rows with
+        a `duplicate_of` url are stored as links to that row instead
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_urls(self) -> Iterator[tuple[str, str]]:
+        """Iterates over the (url, source) of all the stored rows, oldest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_fingerprints(self) -> Iterator[tuple[str, str, Optional[int], str, str]]:
+        """
+        Iterates over the (url, source, simhash, title, description) of all the stored rows,
+        the title and the description are only returned for rows without a fingerprint
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def close(self):
         """Closes a database connection"""
         raise NotImplementedError
+
+
+def get_database_class(backend: str) -> type:
+    """
+    Imports the database class of a storage backend.
+    :param backend: name of the storage backend, e.g. "postgresql"
+    :return: class derived from :py:class:`DataBase`
+    """
+    try:
+        module_path, class_name = StorageBackend[backend.upper()].value.rsplit(".", 1)
+    except KeyError as err:
+        raise ValueError(f"Unknown storage backend: {backend}") from err
+    try:
+        return getattr(importlib.import_module(module_path), class_name)
+    except ImportError as i_err:
+        raise ImportError(f"Unable to import the {backend} storage backend: {i_err}") from i_err
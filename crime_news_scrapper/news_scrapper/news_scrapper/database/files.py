@@ -0,0 +1,195 @@
+"""
+This module defines the base implementation of the storage backends which append the stories
+to local files instead of a database server, e.g. for bulk or offline crawls and for local
+testing without PostgreSQL.
+
+The stories are appended to the `<output_dir>/<table>` files and the near-duplicates to the
+`<output_dir>/<table>_duplicates` files. The files are append-only: with `on_conflict: "update"`
+an already stored story is appended again and the last record of a url is its latest version.
+
+How To Use This Module
+======================
+
+For example:
+1. Import class :py:class:`FileDataBase`:
+   ``from news_scrapper.database.files import FileDataBase``.
+
+2. Derive a storage backend from it, implementing the `write`, `iter_records` and
+   `close` methods.
+"""
+
+from abc import abstractmethod
+from datetime import datetime, timezone
+import hashlib
+import os
+import threading
+from typing import Iterable, Iterator, Optional
+import uuid
+
+from config import DatabaseConfig
+from news_scrapper.database.database import DataBase, WriteResult
+
+STORIES = "stories"
+DUPLICATES = "duplicates"
+# Fields of the records of each kind, in order
+FIELDS = {
+    STORIES: ("source", "title", "description", "url", "location", "date", "simhash"),
+    DUPLICATES: ("url", "source", "title", "date", "duplicate_of", "distance"),
+}
+
+
+def url_key(url: Optional[str]) -> int:
+    """
+    :param url: url of a story
+    :return: 64 bit hash of the url, held in memory instead of the much longer url
+    """
+    return int.from_bytes(hashlib.blake2b((url or "").encode(), digest_size=8).digest(), "big")
+
+
+def new_part_name(extension: str) -> str:
+    """
+    :param extension: extension of the part file, e.g. ".parquet"
+    :return: unique name of a part file written by a crawl, sorted by name after the part
+        files of the earlier crawls
+    """
+    started = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return f"part-{started}-{uuid.uuid4().hex[:12]}{extension}"
+
+
+class FileDataBase(DataBase):
+    """
+    Initializes a :py:class:`FileDataBase` object.
+    Defines the common behaviour of the append-only file storage backends.
+
+    ::return: a new :py:class:`FileDataBase` object
+    """
+
+    def __init__(self, output_dir: str, table: str, on_conflict: str = "nothing"):
+        """
+        :param output_dir: directory to write the files in
+        :param table: base name of the files
+        :param on_conflict: "nothing" to skip or "update" to append the already stored stories
+        """
+        super().__init__(db_name=output_dir, table=table, on_conflict=on_conflict)
+        self.output_dir = output_dir
+        # Hashes of the urls of the stored stories, only 64 bits per story are held in memory
+        self.stored_urls = set()
+        # The batches of concurrent writer threads are appended one at a time
+        self.lock = threading.Lock()
+        self.migrate()
+        self.connect()
+
+    @classmethod
+    def from_config(cls, db_config: DatabaseConfig) -> "FileDataBase":
+        """
+        Creates the database object from the `database` section of the config.
+        :param db_config: `DatabaseConfig` object
+        :return: `FileDataBase` object
+        """
+        return cls(
+            output_dir=db_config.output_dir,
+            table=db_config.table_name,
+            on_conflict=db_config.on_conflict,
+        )
+
+    def connect(self) -> None:
+        """Reads the urls of the already stored stories, the files are opened on the first write"""
+        self.log.info("Reading the stored urls of %s in %s", self.table, self.output_dir)
+        self.stored_urls = {url_key(url) for url, _ in self.iter_urls()}
+        self.log.info("Found %s stored urls", len(self.stored_urls))
+
+    def migrate(self) -> None:
+        """Creates the output directory"""
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def path(self, kind: str, suffix: str = "") -> str:
+        """
+        :param kind: kind of the records, stories or duplicates
+        :param suffix: file name suffix, e.g. the extension
+        :return: path of the file (or the directory) of the records of a kind
+        """
+        name = self.table if kind == STORIES else f"{self.table}_duplicates"
+        return os.path.join(self.output_dir, f"{name}{suffix}")
+
+    def add(self, params: dict) -> WriteResult:
+        """
+        Appends a single story.
+        :param params: dict of values to be stored
+        :return: `WriteResult` object with the counts of affected rows
+        """
+        return self.add_many(rows=[params])
+
+    def add_many(self, rows: list[dict]) -> WriteResult:
+        """
+        Appends a batch of stories with a single write. Rows with a `duplicate_of` url
+        are appended to the near-duplicates instead.
+        :param rows: list of dicts of values to be stored
+        :return: `WriteResult` object with the counts of affected rows
+        """
+        duplicates = [row for row in rows if row.get("duplicate_of")]
+        unique_rows = list(
+            {row.get("url"): row for row in rows if not row.get("duplicate_of")}.values()
+        )
+        result = WriteResult(skipped=len(rows) - len(duplicates) - len(unique_rows))
+        with self.lock:
+            stories = []
+            for row in unique_rows:
+                key = url_key(row.get("url"))
+                if key not in self.stored_urls:
+                    result.inserted += 1
+                elif self.on_conflict == "update":
+                    result.updated += 1
+                else:
+                    result.skipped += 1
+                    continue
+                stories.append(row)
+            try:
+                if stories:
+                    self.write(kind=STORIES, records=self.to_records(STORIES, stories))
+                if duplicates:
+                    self.write(kind=DUPLICATES, records=self.to_records(DUPLICATES, duplicates))
+            except Exception as err:
+                self.log.error("Appending a batch of %s rows failed: %s", len(rows), err)
+                raise err
+            self.stored_urls.update(url_key(row.get("url")) for row in stories)
+        result.linked = len(duplicates)
+        return result
+
+    @staticmethod
+    def to_records(kind: str, rows: Iterable[dict]) -> list[dict]:
+        """
+        :param kind: kind of the records, stories or duplicates
+        :param rows: scraped items or dicts
+        :return: list of dicts holding only the fields of the kind
+        """
+        return [{name: row.get(name) for name in FIELDS[kind]} for row in rows]
+
+    @abstractmethod
+    def write(self, kind: str, records: list[dict]) -> None:
+        """Appends the records of a kind to its file"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_records(self, kind: str, columns: tuple[str, ...]) -> Iterator[dict]:
+        """Iterates over the given columns of the records of a kind, oldest first"""
+        raise NotImplementedError
+
+    def iter_urls(self) -> Iterator[tuple[str, str]]:
+        """
+        Iterates over the url and the source of all the stored stories, oldest first.
+        :return: iterator of (url, source) tuples
+        """
+        for record in self.iter_records(kind=STORIES, columns=("url", "source")):
+            yield record["url"], record["source"]
+
+    def iter_fingerprints(self) -> Iterator[tuple[str, str, Optional[int], str, str]]:
+        """
+        Iterates over the near-duplicate fingerprints of all the stored stories, oldest first.
+        :return: iterator of (url, source, simhash, title, description) tuples
+        """
+        columns = ("url", "source", "simhash", "title", "description")
+        for record in self.iter_records(kind=STORIES, columns=columns):
+            if record["simhash"] is None:
+                yield tuple(record[column] for column in columns)
+            else:
+                yield record["url"], record["source"], record["simhash"], None, None
@@ -0,0 +1,128 @@
+"""
+This module provides functionality to store the data to gzip compressed JSON lines files,
+one JSON object per story. Every crawl writes a new part file to the `<output_dir>/<table>`
+directory, and every batch is flushed so that a stopped crawl loses at most the batch being
+written. The incomplete end of the part file of a stopped crawl is skipped when reading, the
+part files written later are not affected by it.
+
+How To Use This Module
+======================
+
+For example:
+1. Import class :py:class:`JSONLinesDB`:
+   ``from news_scrapper.database.jsonl import JSONLinesDB``.
+
+2. Initialize class:
+   jsonl_db = JSONLinesDB(output_dir="output", table="crimedata")
+
+3. Start using its methods:
+   jsonl_db.add_many(rows=rows)
+"""
+
+from datetime import datetime
+import glob
+import gzip
+import json
+import os
+from typing import Any, Iterator
+import zlib
+
+from config import DatabaseConfig
+from news_scrapper.database.files import FileDataBase, new_part_name
+
+
+def encode_value(value: Any) -> str:
+    """
+    Encodes the values which are not JSON serializable, i.e. the dates.
+    :param value: value of a field
+    :return: ISO 8601 string of a date
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSONLinesDB(FileDataBase):
+    """
+    Initializes a :py:class:`JSONLinesDB` object.
+    Defines a behaviour for storing data to the `<output_dir>/<table>/*.jsonl.gz` files
+
+    ::return: a new :py:class:`JSONLinesDB` object
+    """
+
+    EXTENSION = ".jsonl.gz"
+
+    def __init__(self, *args, compression_level: int = 6, **kwargs):
+        """
+        :param compression_level: gzip compression level, 1 (fastest) to 9 (smallest)
+        """
+        self.compression_level = compression_level
+        self.files = {}
+        # Part files of this crawl, sorted by name after the part files of the earlier crawls
+        self.part_name = new_part_name(self.EXTENSION)
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def from_config(cls, db_config: DatabaseConfig) -> "JSONLinesDB":
+        """
+        Creates the database object from the `database` section of the config.
+        :param db_config: `DatabaseConfig` object
+        :return: `JSONLinesDB` object
+        """
+        return cls(
+            output_dir=db_config.output_dir,
+            table=db_config.table_name,
+            on_conflict=db_config.on_conflict,
+            compression_level=db_config.compression_level,
+        )
+
+    def write(self, kind: str, records: list[dict]) -> None:
+        """
+        Appends the records as JSON lines and flushes the compressed data to the part file
+        of this crawl.
+        :param kind: kind of the records, stories or duplicates
+        :param records: list of dicts to append
+        """
+        if kind not in self.files:
+            directory = self.path(kind)
+            os.makedirs(directory, exist_ok=True)
+            self.files[kind] = gzip.open(
+                os.path.join(directory, self.part_name),
+                mode="wb",
+                compresslevel=self.compression_level,
+            )
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False, default=encode_value) + "\n"
+            for record in records
+        )
+        self.files[kind].write(lines.encode("utf-8"))
+        self.files[kind].flush()
+
+    def iter_records(self, kind: str, columns: tuple[str, ...]) -> Iterator[dict]:
+        """
+        Iterates over the records of a kind line by line, without reading the whole files.
+        A part file of a stopped crawl may end with an incomplete gzip member or line, all
+        the complete lines before it are still read, and a malformed line is skipped alone.
+        :param kind: kind of the records, stories or duplicates
+        :param columns: names of the fields to return
+        :return: iterator of dicts of the given fields
+        """
+        pattern = os.path.join(glob.escape(self.path(kind)), "*" + self.EXTENSION)
+        for path in sorted(glob.glob(pattern)):
+            try:
+                with gzip.open(path, mode="rt", encoding="utf-8") as file:
+                    for number, line in enumerate(file, start=1):
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError as err:
+                            self.log.warning("Skipping line %s of %s: %s", number, path, err)
+                            continue
+                        yield {column: record.get(column) for column in columns}
+            except (EOFError, zlib.error, gzip.BadGzipFile) as err:
+                self.log.warning("Skipping the damaged end of %s: %s", path, err)
+
+    def close(self) -> None:
+        """Writes the end of the gzip members and closes the files"""
+        for file in self.files.values():
+            file.close()
+        self.files = {}
@@ -0,0 +1,179 @@
+"""
+This module defines the versioned schema migrations of the PostgreSQL table storing the
+crime stories. The migrations are applied in order of their version at startup, each of
+them only once, and the applied versions are recorded in a `<table>_schema_version` table.
+
+Every statement is a template where `{table}` is replaced with the table name.
+A migration with an `option` is applied only when that option of the database object is
+enabled, e.g. the full-text index, and gets applied by a later run once it is enabled.
+
+How To Use This Module
+======================
+
+For example:
+1. Import the migrations:
+   ``from news_scrapper.database.migrations import POSTGRESQL_MIGRATIONS``.
+
+2. Add a new migration at the end of the list with the next version number:
+   Migration(version=7, description="...", statements=("ALTER TABLE {table} ...",))
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A single versioned schema change"""
+
+    version: int
+    description: str
+    statements: tuple[str, ...]
+    # Name of the boolean database option which enables this migration, if optional
+    option: Optional[str] = None
+
+
+POSTGRESQL_MIGRATIONS = (
+    Migration(
+        version=1,
+        description="create the table",
+        statements=(
+            """
+            CREATE TABLE IF NOT EXISTS {table}
+            (
+                ID SERIAL PRIMARY KEY,
+                source TEXT,
+                title TEXT UNIQUE,
+                description TEXT UNIQUE,
+                url TEXT UNIQUE,
+                location text,
+                date TEXT
+            )
+            """,
+        ),
+    ),
+    Migration(
+        version=2,
+        description="store the date as timestamp with time zone",
+        statements=(
+            # The dates were stored as "DD-MM-YY HH24-MI-SS" strings in IST
+            """
+            DO $$
+            BEGIN
+                IF (
+                    SELECT data_type FROM information_schema.columns
+                    WHERE table_name = lower('{table}') AND column_name = 'date'
+                ) = 'text' THEN
+                    ALTER TABLE {table} ALTER COLUMN date TYPE TIMESTAMPTZ
+                    USING to_timestamp(NULLIF(date, ''), 'DD-MM-YY HH24-MI-SS')::timestamp
+                        AT TIME ZONE 'Asia/Kolkata';
+                END IF;
+            END $$
+            """,
+            "CREATE INDEX IF NOT EXISTS {table}_date_idx ON {table} (date)",
+        ),
+    ),
+    Migration(
+        version=3,
+        description="deduplicate on hashed keys instead of the full strings",
+        statements=(
+            "ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_title_key",
+            "ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_description_key",
+            "ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_url_key",
+            """
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS url_hash BYTEA
+                GENERATED ALWAYS AS (decode(md5(url), 'hex')) STORED
+            """,
+            # Normalized so that the same story differing only in case or
+            # surrounding whitespace is still a duplicate
+            """
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash BYTEA
+                GENERATED ALWAYS AS (
+                    decode(md5(
+                        lower(btrim(coalesce(title, ''))) || E'\\n' ||
+                        lower(btrim(coalesce(description, '')))
+                    ), 'hex')
+                ) STORED
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS {table}_url_hash_key ON {table} (url_hash)",
+            # The unique title and description did not prevent the rows which differ only
+            # in case or surrounding whitespace, such rows are reported to be resolved by
+            # hand instead of being deleted here
+            """
+            DO $$
+            DECLARE
+                collisions BIGINT;
+            BEGIN
+                SELECT count(*) INTO collisions
+                FROM {table} AS duplicate JOIN {table} AS kept
+                    ON duplicate.content_hash = kept.content_hash AND duplicate.ID > kept.ID
+                WHERE nullif(btrim(duplicate.title), '') IS NOT NULL
+                    OR nullif(btrim(duplicate.description), '') IS NOT NULL;
+                IF collisions > 0 THEN
+                    RAISE EXCEPTION '% rows of {table} have the title and the description of '
+                        'an earlier row', collisions
+                        USING HINT = 'Find them by their content_hash and delete or edit them';
+                END IF;
+            END $$
+            """,
+            # The stories without any title and description are distinct
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS {table}_content_hash_key
+                ON {table} (content_hash)
+                WHERE nullif(btrim(title), '') IS NOT NULL
+                    OR nullif(btrim(description), '') IS NOT NULL
+            """,
+        ),
+    ),
+    Migration(
+        version=4,
+        description="index the source, date and location",
+        statements=(
+            """
+            CREATE INDEX IF NOT EXISTS {table}_source_date_idx
+                ON {table} (source, date DESC)
+            """,
+            "CREATE INDEX IF NOT EXISTS {table}_location_idx ON {table} (location)",
+        ),
+    ),
+    Migration(
+        version=5,
+        description="full-text index on the title and the description",
+        statements=(
+            """
+            CREATE INDEX IF NOT EXISTS {table}_fts_idx ON {table} USING GIN (
+                to_tsvector(
+                    'english'::regconfig,
+                    coalesce(title, '') || ' ' || coalesce(description, '')
+                )
+            )
+            """,
+        ),
+        option="full_text_index",
+    ),
+    Migration(
+        version=6,
+        description="store the near-duplicate fingerprints and links",
+        statements=(
+            # SimHash fingerprint of the title and the description, as a signed 64 bit integer
+            "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS simhash BIGINT",
+            # Near-duplicates of the stored stories, linked to the story they duplicate
+            """
+            CREATE TABLE IF NOT EXISTS {table}_duplicates
+            (
+                url TEXT PRIMARY KEY,
+                source TEXT,
+                title TEXT,
+                date TIMESTAMPTZ,
+                duplicate_of TEXT NOT NULL,
+                distance SMALLINT,
+                found_at TIMESTAMPTZ DEFAULT now()
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS {table}_duplicates_duplicate_of_idx
+                ON {table}_duplicates (duplicate_of)
+            """,
+        ),
+    ),
+)
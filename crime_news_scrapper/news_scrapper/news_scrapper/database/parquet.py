@@ -0,0 +1,157 @@
+"""
+This module provides functionality to store the data to Parquet files with pyarrow, which load
+into the analytics tools (pandas, polars, DuckDB, Spark) as a single dataset.
+
+Every crawl writes a new part file to the `<output_dir>/<table>` directory. The rows are
+buffered and written as one row group once `row_group_size` rows are buffered, hence at most
+`row_group_size` rows are held in memory. A part file is only readable once it is closed at
+the end of the crawl, so this backend suits bulk and offline crawls.
+
+How To Use This Module
+======================
+
+For example:
+1. Import class :py:class:`ParquetDB`:
+   ``from news_scrapper.database.parquet import ParquetDB``.
+
+2. Initialize class:
+   parquet_db = ParquetDB(output_dir="output", table="crimedata")
+
+3. Start using its methods:
+   parquet_db.add_many(rows=rows)
+"""
+
+import os
+from typing import Iterator
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is only needed by this backend
+    pa = None
+
+from config import DatabaseConfig
+from news_scrapper.database.files import DUPLICATES, STORIES, FileDataBase, new_part_name
+
+
+def get_schemas() -> dict:
+    """:return: the `pyarrow.Schema` of the records of each kind"""
+    return {
+        STORIES: pa.schema(
+            [
+                ("source", pa.string()),
+                ("title", pa.string()),
+                ("description", pa.string()),
+                ("url", pa.string()),
+                ("location", pa.string()),
+                ("date", pa.timestamp("us", tz="UTC")),
+                ("simhash", pa.uint64()),
+            ]
+        ),
+        DUPLICATES: pa.schema(
+            [
+                ("url", pa.string()),
+                ("source", pa.string()),
+                ("title", pa.string()),
+                ("date", pa.timestamp("us", tz="UTC")),
+                ("duplicate_of", pa.string()),
+                ("distance", pa.int16()),
+            ]
+        ),
+    }
+
+
+class ParquetDB(FileDataBase):
+    """
+    Initializes a :py:class:`ParquetDB` object.
+    Defines a behaviour for storing data to the `<output_dir>/<table>/*.parquet` files
+
+    ::return: a new :py:class:`ParquetDB` object
+    """
+
+    def __init__(self, *args, row_group_size: int = 10000, **kwargs):
+        """
+        :param row_group_size: number of rows buffered and written as one row group
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required by the parquet storage backend")
+        self.row_group_size = row_group_size
+        self.schemas = get_schemas()
+        self.buffers = {STORIES: [], DUPLICATES: []}
+        self.writers = {}
+        # Part files of this crawl, sorted by name after the part files of the earlier crawls
+        self.part_name = new_part_name(".parquet")
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def from_config(cls, db_config: DatabaseConfig) -> "ParquetDB":
+        """
+        Creates the database object from the `database` section of the config.
+        :param db_config: `DatabaseConfig` object
+        :return: `ParquetDB` object
+        """
+        return cls(
+            output_dir=db_config.output_dir,
+            table=db_config.table_name,
+            on_conflict=db_config.on_conflict,
+            row_group_size=db_config.row_group_size,
+        )
+
+    def write(self, kind: str, records: list[dict]) -> None:
+        """
+        Buffers the records and writes the full row groups.
+        :param kind: kind of the records, stories or duplicates
+        :param records: list of dicts to append
+        """
+        buffer = self.buffers[kind]
+        buffer.extend(records)
+        while len(buffer) >= self.row_group_size:
+            self.write_row_group(kind=kind, records=buffer[: self.row_group_size])
+            del buffer[: self.row_group_size]
+
+    def write_row_group(self, kind: str, records: list[dict]) -> None:
+        """
+        Writes the records as a single row group of the part file of this crawl.
+        :param kind: kind of the records, stories or duplicates
+        :param records: list of dicts to write
+        """
+        if kind not in self.writers:
+            directory = self.path(kind)
+            os.makedirs(directory, exist_ok=True)
+            self.writers[kind] = pq.ParquetWriter(
+                os.path.join(directory, self.part_name),
+                schema=self.schemas[kind],
+                compression="zstd",
+            )
+        table = pa.Table.from_pylist(records, schema=self.schemas[kind])
+        self.writers[kind].write_table(table, row_group_size=len(records))
+        self.log.debug("Wrote a row group of %s %s", len(records), kind)
+
+    def iter_records(self, kind: str, columns: tuple[str, ...]) -> Iterator[dict]:
+        """
+        Iterates over the given columns of the records of a kind, reading only those
+        columns, one batch of rows at a time. The part files left incomplete by a
+        stopped crawl are skipped.
+        :param kind: kind of the records, stories or duplicates
+        :param columns: names of the fields to return
+        :return: iterator of dicts of the given fields
+        """
+        directory = self.path(kind)
+        if not os.path.isdir(directory):
+            return
+        dataset = ds.dataset(
+            directory, schema=self.schemas[kind], format="parquet", exclude_invalid_files=True
+        )
+        for batch in dataset.to_batches(columns=list(columns)):
+            yield from batch.to_pylist()
+
+    def close(self) -> None:
+        """Writes the buffered rows and the footers of the part files"""
+        for kind, buffer in self.buffers.items():
+            if buffer:
+                self.write_row_group(kind=kind, records=buffer)
+                buffer.clear()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
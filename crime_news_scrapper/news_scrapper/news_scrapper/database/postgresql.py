@@ -12,13 +12,24 @@ For example:
    postgres_db = PostgreSQLDB()
 
 3. Start using its methods:
-   postgres_db.connect()
+   postgres_db.add_many(rows=rows)
 """
 
+from contextlib import contextmanager
 import os
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from twisted.python import threadable
 
-from news_scrapper.database.database import DataBase
+from config import DatabaseConfig
+from news_scrapper.database.database import DataBase, WriteResult
+from news_scrapper.database.migrations import POSTGRESQL_MIGRATIONS
+from news_scrapper.near_duplicates import to_signed, to_unsigned
 
 
 class PostgreSQLDB(DataBase):
@@ -26,23 +37,75 @@ class PostgreSQLDB(DataBase):
     Initializes a :py:class:`PostgreSQLDB` object.
     Defines a behaviour for storing data to PostgreSQL database
 
+    The connections are taken from a thread-safe pool, so that several writer threads can
+    write concurrently. A connection is checked before use, broken connections are replaced
+    and an operation failing on a lost connection is retried with an exponential backoff.
+
     ::return: a new :py:class:`PostgreSQLDB` object
     """
 
-    def __init__(self, db_name, *args, **kwargs):
+    # Errors of a lost connection (or of a deadlock) after which an operation is retried
+    RETRIED_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+    def __init__(
+        self,
+        db_name,
+        *args,
+        full_text_index: bool = False,
+        pool_size: int = 2,
+        max_retries: int = 5,
+        retry_backoff: float = 1.0,
+        health_check_interval: float = 30,
+        **kwargs,
+    ):
         password = os.environ.get("DB_PASSWORD")
         super().__init__(db_name=db_name, password=password, *args, **kwargs)
-        self.connection = self.connect()
-        self.cursor = self.connection.cursor()
-        self.create_table(self.table)
+        # Enables the optional migration creating a GIN full-text index
+        self.full_text_index = full_text_index
+        self.pool_size = max(pool_size, 1)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Connections idle for longer than this (in seconds) are pinged before use
+        self.health_check_interval = health_check_interval
+        # Threads wait for a free connection instead of failing on an exhausted pool
+        self.slots = threading.BoundedSemaphore(self.pool_size)
+        self.last_used = {}
+        self.pool = self.connect()
+        self.migrate()
+
+    @classmethod
+    def from_config(cls, db_config: DatabaseConfig) -> "PostgreSQLDB":
+        """
+        Creates the database object from the `database` section of the config.
+        :param db_config: `DatabaseConfig` object
+        :return: `PostgreSQLDB` object
+        """
+        return cls(
+            db_name=db_config.db_name,
+            username=db_config.username,
+            host=db_config.host,
+            port=db_config.port,
+            table=db_config.table_name,
+            on_conflict=db_config.on_conflict,
+            full_text_index=db_config.full_text_index,
+            pool_size=db_config.pool_size,
+            max_retries=db_config.max_retries,
+            retry_backoff=db_config.retry_backoff,
+            health_check_interval=db_config.health_check_interval,
+        )
 
-    def connect(self) -> None:
+    def connect(self) -> ThreadedConnectionPool:
         """
-        Establishes an actual conncetion with postgresql database using psycopg2 module
+        Creates a pool of connections with postgresql database using psycopg2 module,
+        a connection is opened right away and the others on demand.
         """
-        self.log.info("Establishing a connection with database: %s", self.db_name)
+        self.log.info(
+            "Establishing a pool of %s connections with database: %s", self.pool_size, self.db_name
+        )
         try:
-            return psycopg2.connect(
+            return ThreadedConnectionPool(
+                minconn=1,
+                maxconn=self.pool_size,
                 database=self.db_name,
                 user=self.db_username,
                 password=self.db_password,
@@ -53,61 +116,334 @@ class PostgreSQLDB(DataBase):
             self.log.error("Error establishing a database connection: %s", err)
             raise
 
-    def create_table(self, table_name: str) -> None:
+    def is_healthy(self, connection) -> bool:
         """
-        Creates a table with rows as ID(auto incremented primary key), source, title,
-        description, url, location, date all as string.
-        :param table_name: table name to create.
+        Checks a connection taken from the pool. A connection idle for longer than
+        `health_check_interval` seconds is pinged, as the server may have dropped it.
+        :param connection: psycopg2 connection
+        :return: whether the connection can be used
         """
-        self.log.info("Creating a table: %s", table_name)
+        if connection.closed:
+            return False
+        idle = time.monotonic() - self.last_used.get(connection, 0)
+        if idle < self.health_check_interval:
+            return True
         try:
-            self.cursor.execute(
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+        except psycopg2.Error as err:
+            self.log.warning("Dropping a broken database connection: %s", err)
+            return False
+        return True
+
+    @contextmanager
+    def pooled_connection(self) -> Iterator:
+        """
+        Lends a healthy connection from the pool, broken connections are closed
+        instead of being returned to the pool.
+        :return: psycopg2 connection
+        """
+        with self.slots:
+            connection = self.pool.getconn()
+            while not self.is_healthy(connection):
+                self.last_used.pop(connection, None)
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+            try:
+                yield connection
+            finally:
+                # A connection is returned to the pool outside of any transaction
+                broken = bool(connection.closed)
+                if not broken:
+                    try:
+                        connection.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                if broken:
+                    self.last_used.pop(connection, None)
+                else:
+                    self.last_used[connection] = time.monotonic()
+                self.pool.putconn(connection, close=broken)
+
+    def run(self, operation: Callable, *args) -> Any:
+        """
+        Runs an operation with a connection from the pool. If the connection is lost (or
+        a deadlock is detected) the operation is retried on another connection, up to
+        `max_retries` times waiting `retry_backoff` seconds, doubled after every retry.
+        On the reactor thread, i.e. in the "sync" write mode, waiting would stall the whole
+        crawl, hence the operation is only retried once on a new connection right away.
+        :param operation: callable taking a connection and the given arguments
+        :return: whatever the operation returns
+        """
+        on_reactor = threadable.isInIOThread()
+        max_retries = min(self.max_retries, 1) if on_reactor else self.max_retries
+        for attempt in range(max_retries + 1):
+            try:
+                with self.pooled_connection() as connection:
+                    return operation(connection, *args)
+            except self.RETRIED_ERRORS as err:
+                if attempt == max_retries:
+                    self.log.error("Giving up after %s retries: %s", max_retries, err)
+                    raise
+                if on_reactor:
+                    self.log.warning("Database operation failed, retrying right away: %s", err)
+                    continue
+                delay = self.retry_backoff * 2**attempt
+                self.log.warning(
+                    "Database operation failed (attempt %s of %s), retrying in %.1f seconds: %s",
+                    attempt + 1,
+                    max_retries + 1,
+                    delay,
+                    err,
+                )
+                time.sleep(delay)
+        return None
+
+    def migrate(self) -> None:
+        """
+        Brings the table schema up to date by applying the pending migrations of
+        :py:data:`POSTGRESQL_MIGRATIONS` in order, each one in its own transaction.
+        An advisory lock keeps concurrently starting crawlers from migrating twice.
+        """
+        self.log.info("Migrating the schema of the table: %s", self.table)
+        self.run(self._migrate)
+
+    def _migrate(self, connection) -> None:
+        """Applies the pending migrations using a connection"""
+        version_table = f"{self.table}_schema_version"
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (version_table,))
+            cursor.execute(
                 f"""
-                CREATE TABLE IF NOT EXISTS {table_name}
+                CREATE TABLE IF NOT EXISTS {version_table}
                 (
-                    ID SERIAL PRIMARY KEY,
-                    source TEXT,
-                    title TEXT UNIQUE,
-                    description TEXT UNIQUE,
-                    url TEXT UNIQUE,
-                    location text,
-                    date TEXT
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMPTZ DEFAULT now()
                 )
             """
             )
-            self.connection.commit()
+            connection.commit()
+            cursor.execute(f"SELECT version FROM {version_table}")
+            applied = {version for (version,) in cursor.fetchall()}
+            for migration in POSTGRESQL_MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                if migration.option and not getattr(self, migration.option, False):
+                    continue
+                self.log.info("Applying migration %s: %s", migration.version, migration.description)
+                for statement in migration.statements:
+                    cursor.execute(statement.replace("{table}", self.table))
+                cursor.execute(
+                    f"INSERT INTO {version_table} (version, description) VALUES (%s, %s)",
+                    (migration.version, migration.description),
+                )
+                connection.commit()
         except psycopg2.Error as err:
-            self.log.error("Table creation failed: %s", err)
-            self.connection.rollback()
+            self.log.error("Schema migration failed: %s", err)
+            if not connection.closed:
+                connection.rollback()
+            raise
+        finally:
+            if not connection.closed:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (version_table,))
+                connection.commit()
+                cursor.close()
 
-    def add(self, params: dict) -> None:
+    def add(self, params: dict) -> WriteResult:
         """
         Performs insert operation for a table. Inserts source, title, description,
         url, location and the date values to a database table.
         :param params: dict of values to be inserted
+        :return: `WriteResult` object with the counts of affected rows
+        """
+        return self.add_many(rows=[params])
+
+    def add_many(self, rows: list[dict]) -> WriteResult:
+        """
+        Performs a single multi-row upsert operation for a table followed by one commit,
+        instead of a round trip and a commit per row. Rows whose url is already stored are
+        either skipped or, if `on_conflict` is "update", updated when any value changed.
+        Rows with a `duplicate_of` url are linked to that row instead of being inserted.
+        :param rows: list of dicts of values to be inserted
+        :return: `WriteResult` object with the counts of affected rows
+        """
+        duplicates = [row for row in rows if row.get("duplicate_of")]
+        # A single upsert statement can not affect the same row twice, hence keep only the
+        # last row for every url within a batch. The rows are sorted so that concurrent
+        # writers lock the conflicting rows in the same order and do not deadlock.
+        unique_rows = sorted(
+            {row.get("url"): row for row in rows if not row.get("duplicate_of")}.values(),
+            key=lambda row: row.get("url") or "",
+        )
+        result = WriteResult(skipped=len(rows) - len(duplicates) - len(unique_rows))
+        if duplicates:
+            result += self.run(self._link_duplicates, duplicates)
+        if unique_rows:
+            self.log.debug("Executing batch upsert of %s rows", len(unique_rows))
+            result += self.run(self._upsert_batch, unique_rows)
+        return result
+
+    def _upsert_batch(self, connection, rows: list[dict]) -> WriteResult:
+        """
+        Upserts the rows with a single statement and commits, falls back to upserting
+        row by row if the batch violates a unique constraint.
+        :param connection: psycopg2 connection
+        :param rows: list of dicts of values to be inserted, with unique urls
+        :return: `WriteResult` object with the counts of affected rows
+        """
+        result = WriteResult()
+        with connection.cursor() as cursor:
+            try:
+                result += self._upsert(cursor, rows)
+                connection.commit()
+            except psycopg2.IntegrityError as err:
+                # The content hash unique constraint (title and description) was violated,
+                # fall back to upserting row by row so that only the offending rows are lost.
+                connection.rollback()
+                self.log.warning("Batch upsert failed, retrying row by row: %s", err)
+                for row in rows:
+                    try:
+                        result += self._upsert(cursor, [row])
+                        connection.commit()
+                    except psycopg2.IntegrityError as row_err:
+                        connection.rollback()
+                        self.log.error("Insert Failed: %s %s", row_err, row)
+                        result.failed += 1
+            except self.RETRIED_ERRORS:
+                raise
+            except Exception as err:
+                self.log.error("Batch upsert of %s rows failed: %s", len(rows), err)
+                connection.rollback()
+                raise err
+        return result
+
+    def _link_duplicates(self, connection, rows: list[dict]) -> WriteResult:
+        """
+        Stores the near-duplicates of the stored rows as links to them, in a separate
+        transaction so that a failure does not lose the rest of the batch.
+        :param connection: psycopg2 connection
+        :param rows: list of dicts of values of the near-duplicates
+        :return: `WriteResult` object with the count of linked rows
         """
-        self.log.debug("Executing Insert")
         try:
-            self.cursor.execute(
-                f"""
-            INSERT INTO {self.table} (source, title, description, url, location, date)
-            VALUES (%s, %s, %s, %s, %s, %s)""",
+            with connection.cursor() as cursor:
+                returned = execute_values(
+                    cursor,
+                    f"""
+                    INSERT INTO {self.table}_duplicates
+                        (url, source, title, date, duplicate_of, distance)
+                    VALUES %s ON CONFLICT (url) DO NOTHING RETURNING true""",
+                    [
+                        (
+                            row.get("url"),
+                            row.get("source"),
+                            row.get("title"),
+                            row.get("date"),
+                            row.get("duplicate_of"),
+                            row.get("distance"),
+                        )
+                        for row in rows
+                    ],
+                    page_size=len(rows),
+                    fetch=True,
+                )
+            connection.commit()
+        except self.RETRIED_ERRORS:
+            raise
+        except psycopg2.Error as err:
+            self.log.error("Linking %s near-duplicates failed: %s", len(rows), err)
+            connection.rollback()
+            return WriteResult(failed=len(rows))
+        return WriteResult(linked=len(returned), skipped=len(rows) - len(returned))
+
+    def _upsert(self, cursor, rows: list[dict]) -> WriteResult:
+        """
+        Executes a single INSERT .. ON CONFLICT statement without committing it.
+        :param cursor: psycopg2 cursor
+        :param rows: list of dicts of values to be inserted, with unique urls
+        :return: `WriteResult` object with the counts of affected rows
+        """
+        if self.on_conflict == "update":
+            # Updated rows have a non zero xmax, unchanged rows are not returned at all
+            conflict_clause = f"""
+            ON CONFLICT (url_hash) DO UPDATE SET
+                source = EXCLUDED.source,
+                title = EXCLUDED.title,
+                description = EXCLUDED.description,
+                location = EXCLUDED.location,
+                date = EXCLUDED.date,
+                simhash = EXCLUDED.simhash
+            WHERE ({self.table}.source, {self.table}.title, {self.table}.description,
+                   {self.table}.location, {self.table}.date)
+                IS DISTINCT FROM (EXCLUDED.source, EXCLUDED.title, EXCLUDED.description,
+                                  EXCLUDED.location, EXCLUDED.date)
+            RETURNING (xmax = 0)"""
+        else:
+            conflict_clause = "ON CONFLICT DO NOTHING RETURNING true"
+        returned = execute_values(
+            cursor,
+            f"""
+            INSERT INTO {self.table} (source, title, description, url, location, date, simhash)
+            VALUES %s {conflict_clause}""",
+            [
                 (
-                    params["source"],
-                    params["title"],
-                    params["description"],
-                    params["url"],
-                    params["location"],
-                    params["date"],
-                ),
-            )
-            self.connection.commit()
-        except Exception as err:
-            self.log.error("Insert Failed: %s %s", err, params)
-            self.connection.rollback()
-            raise err
+                    row.get("source"),
+                    row.get("title"),
+                    row.get("description"),
+                    row.get("url"),
+                    row.get("location"),
+                    row.get("date"),
+                    to_signed(row["simhash"]) if row.get("simhash") else None,
+                )
+                for row in rows
+            ],
+            page_size=len(rows),
+            fetch=True,
+        )
+        inserted = sum(1 for (is_insert,) in returned if is_insert)
+        updated = len(returned) - inserted
+        return WriteResult(inserted=inserted, updated=updated, skipped=len(rows) - len(returned))
+
+    def iter_urls(self) -> Iterator[tuple[str, str]]:
+        """
+        Iterates over the url and the source of all the stored rows, oldest first. Uses a
+        server side cursor so that the whole table is never held in memory at once.
+        :return: iterator of (url, source) tuples
+        """
+        with self.pooled_connection() as connection:
+            with connection.cursor(name="iter_urls") as cursor:
+                cursor.itersize = 10000
+                cursor.execute(f"SELECT url, source FROM {self.table} ORDER BY id")
+                yield from cursor
+            connection.commit()
+
+    def iter_fingerprints(self) -> Iterator[tuple[str, str, Optional[int], str, str]]:
+        """
+        Iterates over the near-duplicate fingerprints of all the stored rows, oldest first.
+        Rows stored before the fingerprints were introduced have none, their title and
+        description are returned instead so that the fingerprint can be computed.
+        :return: iterator of (url, source, simhash, title, description) tuples
+        """
+        with self.pooled_connection() as connection:
+            with connection.cursor(name="iter_fingerprints") as cursor:
+                cursor.itersize = 10000
+                cursor.execute(
+                    f"""
+                    SELECT url, source, simhash,
+                        CASE WHEN simhash IS NULL THEN title END,
+                        CASE WHEN simhash IS NULL THEN description END
+                    FROM {self.table} ORDER BY id"""
+                )
+                for url, source, simhash, title, description in cursor:
+                    if simhash is not None:
+                        simhash = to_unsigned(simhash)
+                    yield url, source, simhash, title, description
+            connection.commit()
 
     def close(self) -> None:
-        """Closes the database connection"""
-        self.cursor.close()
-        self.connection.close()
+        """Closes all the connections of the pool"""
+        self.pool.closeall()
+        self.last_used.clear()
@@ -0,0 +1,126 @@
+"""
+This module provides a non-blocking writer which runs the blocking database calls of any
+:py:class:`DataBase` implementation on a dedicated thread pool, so that the reactor thread
+is never stalled by the database driver.
+
+How To Use This Module
+======================
+
+For example:
+1. Import class :py:class:`AsyncDBWriter`:
+   ``from news_scrapper.database.writer import AsyncDBWriter``.
+
+2. Initialize class with an already initialized database object:
+   writer = AsyncDBWriter(db=postgres_db, max_pending=4)
+
+3. Start the writer and submit the rows to be written:
+   writer.start()
+   deferred = writer.write(rows=rows)
+
+4. Wait for the pending writes and stop the writer:
+   deferred = writer.close()
+"""
+
+import logging
+import time
+from typing import Callable, Optional
+
+from twisted.internet.defer import Deferred, DeferredList, DeferredSemaphore
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+from news_scrapper.database.database import DataBase, WriteResult
+
+
+class AsyncDBWriter:
+    """
+    Initializes a :py:class:`AsyncDBWriter` object.
+    Writes batches of rows through a :py:class:`DataBase` object on a thread pool.
+    At most `max_pending` batches are queued or being written at any time, further
+    writes are accepted only once a slot frees up which provides the backpressure.
+
+    ::return: a new :py:class:`AsyncDBWriter` object
+    """
+
+    def __init__(
+        self,
+        db: DataBase,
+        max_pending: int = 4,
+        threads: int = 1,
+        logger: Optional[logging.Logger] = None,
+        on_failed: Optional[Callable[[list], None]] = None,
+    ):
+        """
+        :param db: database object used to write the rows.
+        :param max_pending: maximum number of batches queued or being written.
+        :param threads: number of writer threads.
+        :param logger: `logging.Logger` object
+        :param on_failed: callable called on the reactor thread with the rows of a failed write.
+        """
+        self.db = db
+        self.log = logger or logging.getLogger()
+        self.on_failed = on_failed
+        self.threads = max(threads, 1)
+        self.slots = DeferredSemaphore(max(max_pending, 1))
+        self.pool = ThreadPool(minthreads=self.threads, maxthreads=self.threads, name="db-writer")
+        self.pending = set()
+
+    def start(self) -> None:
+        """Starts the writer threads"""
+        self.log.info("Starting %s database writer thread(s)", self.threads)
+        self.pool.start()
+
+    def write(
+        self, rows: list, on_written: Optional[Callable[[list, WriteResult, float], None]] = None
+    ) -> Deferred:
+        """
+        Queues the rows to be written with :py:meth:`DataBase.add_many`.
+        The returned deferred fires once the rows are accepted into the queue, which
+        happens immediately unless `max_pending` batches are already pending.
+        :param rows: list of rows to be written.
+        :param on_written: callable called on the reactor thread with the rows, the
+            `WriteResult` and the write latency in seconds once the rows are written.
+        :return: `twisted.internet.defer.Deferred` object
+        """
+        accepted = self.slots.acquire()
+        accepted.addCallback(self._dispatch, rows, on_written)
+        return accepted
+
+    def _dispatch(self, _, rows: list, on_written: Optional[Callable]) -> None:
+        """Hands over the rows to the thread pool once a slot was acquired"""
+        from twisted.internet import reactor
+
+        written = deferToThreadPool(reactor, self.pool, self._timed_write, rows)
+        if on_written is not None:
+            written.addCallback(lambda outcome: on_written(rows, *outcome))
+        written.addErrback(self._on_error, rows)
+        written.addBoth(self._release, written)
+        self.pending.add(written)
+
+    def _timed_write(self, rows: list) -> tuple[WriteResult, float]:
+        """Writes the rows on a writer thread and returns the result and the write latency"""
+        started = time.perf_counter()
+        result = self.db.add_many(rows=rows)
+        return result, time.perf_counter() - started
+
+    def _on_error(self, failure, rows: list) -> None:
+        """Logs a failed write, the remaining batches are still written"""
+        self.log.error("Writing a batch of %s rows failed: %s", len(rows), failure.value)
+        if self.on_failed is not None:
+            self.on_failed(rows)
+
+    def _release(self, result, written: Deferred):
+        """Frees the slot held by a finished write"""
+        self.pending.discard(written)
+        self.slots.release()
+        return result
+
+    def close(self) -> Deferred:
+        """
+        Waits for all the queued and running writes to finish and stops the writer threads.
+        :return: `twisted.internet.defer.Deferred` object
+        """
+        self.log.info("Waiting for %s pending database writes", len(self.pending))
+        finished = DeferredList(list(self.pending))
+        finished.addBoth(lambda _: self.pool.stop())
+        return finished
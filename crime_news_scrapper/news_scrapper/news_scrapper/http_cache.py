@@ -0,0 +1,224 @@
+"""
+This module provides a local HTTP cache of the downloaded pages, so that the development
+reruns and the parser iterations replay the pages from disk instead of downloading them again.
+
+The responses are kept in a single sqlite file, the bodies compressed, instead of the scrapy
+filesystem storage with a directory and six files per response. The listing pages, the AJAX
+calls, the Splash renders and the feeds are revalidated with their `ETag` and `Last-Modified`
+validators as per RFC 2616, while a story page, which does not change once published, is
+replayed without any request for `story_ttl` hours.
+
+How To Use This Module
+======================
+
+Set the cache storage and policy in the scrapy settings::
+
+    HTTPCACHE_STORAGE = "news_scrapper.http_cache.SqliteCacheStorage"
+    HTTPCACHE_POLICY = "news_scrapper.http_cache.NewsCachePolicy"
+
+and enable the `http_cache` section of the config, which the spiders apply to their settings::
+
+    settings.setdict(cache_settings(config=get_config().http_cache), priority="spider")
+"""
+
+from email.utils import formatdate
+import logging
+import sqlite3
+import time
+from typing import Any, Optional
+import zlib
+
+from scrapy import Request, Spider
+from scrapy.extensions.httpcache import RFC2616Policy
+from scrapy.http import Headers, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.settings import BaseSettings
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+from config import HttpCacheConfig, get_config
+from news_scrapper.const import RequestType
+from news_scrapper.log import set_up_logging
+from news_scrapper.seen_index import SeenUrlIndex
+from news_scrapper.throttle import request_type
+
+
+def cache_settings(config: HttpCacheConfig) -> dict[str, Any]:
+    """
+    :param config: config of the `http_cache` section
+    :return: the scrapy settings enabling the cache, empty if it is disabled
+    """
+    if not config.enabled:
+        return {}
+    return {"HTTPCACHE_ENABLED": True}
+
+
+class SqliteCacheStorage:
+    """
+    Initializes a :py:class:`SqliteCacheStorage` object.
+    Scrapy HTTP cache storage keeping the responses in a sqlite file, keyed by the
+    fingerprints of their requests. The bodies without any content encoding are compressed.
+
+    ::return: a new :py:class:`SqliteCacheStorage` object
+    """
+
+    def __init__(self, settings: BaseSettings):
+        """
+        :param settings: `scrapy.settings.BaseSettings` object
+        """
+        app_config = get_config()
+        self.path = app_config.http_cache.path
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.log = logging.getLogger(name="news_scrapper.http_cache")
+        set_up_logging(
+            logger=self.log,
+            log_level=app_config.spider.log_level,
+            file_name=app_config.spider.file_name,
+        )
+        self.connection = None
+        self.fingerprinter = None
+
+    def open_spider(self, spider: Spider) -> None:
+        """
+        Opens (or creates) the sqlite file.
+        :param spider: `scrapy.Spider` object
+        """
+        self.log.info("Opening the HTTP cache: %s", self.path)
+        self.fingerprinter = spider.crawler.request_fingerprinter
+        # The shards of a sharded crawl write to the same file
+        self.connection = sqlite3.connect(self.path, timeout=SeenUrlIndex.SHARED_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses
+            (
+                fingerprint BLOB PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers BLOB,
+                body BLOB,
+                compressed INTEGER,
+                stored_at REAL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def close_spider(self, spider: Spider) -> None:
+        """
+        Closes the sqlite file.
+        :param spider: `scrapy.Spider` object
+        """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
+        """
+        :param spider: `scrapy.Spider` object
+        :param request: `scrapy.Request` object
+        :return: the cached response of the request, None if not cached or expired
+        """
+        row = self.connection.execute(
+            "SELECT url, status, headers, body, compressed, stored_at FROM responses "
+            "WHERE fingerprint = ?",
+            (self.fingerprinter.fingerprint(request),),
+        ).fetchone()
+        if row is None:
+            return None
+        url, status, raw_headers, body, compressed, stored_at = row
+        if 0 < self.expiration_secs < time.time() - stored_at:
+            return None
+        body = zlib.decompress(body) if compressed else body
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        response_class = responsetypes.from_args(headers=headers, url=url, body=body)
+        return response_class(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider: Spider, request: Request, response: Response) -> None:
+        """
+        Stores a response, replacing the response previously cached for its request. The
+        response is not cached if the file stays locked by the other shards of the crawl.
+        :param spider: `scrapy.Spider` object
+        :param request: `scrapy.Request` object
+        :param response: `scrapy.http.Response` object
+        """
+        headers = Headers(response.headers)
+        # The age of a response is computed from its date, a cache adds one if missing
+        if b"Date" not in headers:
+            headers[b"Date"] = formatdate(usegmt=True)
+        # The encoded bodies, e.g. gzip, would not get any smaller
+        compressed = b"Content-Encoding" not in headers
+        body = zlib.compress(response.body) if compressed else response.body
+        try:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(fingerprint, url, status, headers, body, compressed, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.fingerprinter.fingerprint(request),
+                    response.url,
+                    response.status,
+                    headers_dict_to_raw(headers),
+                    body,
+                    compressed,
+                    time.time(),
+                ),
+            )
+            self.connection.commit()
+        except sqlite3.OperationalError as err:
+            self.connection.rollback()
+            self.log.warning("Not caching %s: %s", response.url, err)
+
+
+class NewsCachePolicy(RFC2616Policy):
+    """
+    Initializes a :py:class:`NewsCachePolicy` object.
+    RFC 2616 cache policy which keeps the story pages for `story_ttl` hours whatever their
+    cache headers say, and the other pages for `listing_max_age` seconds before revalidating.
+
+    ::return: a new :py:class:`NewsCachePolicy` object
+    """
+
+    def __init__(self, settings: BaseSettings):
+        """
+        :param settings: `scrapy.settings.BaseSettings` object
+        """
+        super().__init__(settings)
+        config = get_config().http_cache
+        self.story_ttl = config.story_ttl * 3600
+        self.listing_max_age = config.listing_max_age
+
+    def max_age(self, request: Request) -> int:
+        """
+        :param request: `scrapy.Request` object
+        :return: seconds for which the response of the request is used without revalidation,
+            0 to follow its cache headers
+        """
+        if request_type(request) == RequestType.STORY.value:
+            return self.story_ttl
+        return self.listing_max_age
+
+    def should_cache_response(self, response: Response, request: Request) -> bool:
+        """
+        :param response: `scrapy.http.Response` object
+        :param request: `scrapy.Request` object
+        :return: True if the response is to be cached
+        """
+        # A partially downloaded page would be replayed as the whole page
+        if "download_stopped" in response.flags:
+            return False
+        if response.status == 200 and self.max_age(request):
+            return True
+        return super().should_cache_response(response, request)
+
+    def is_cached_response_fresh(self, cachedresponse: Response, request: Request) -> bool:
+        """
+        :param cachedresponse: `scrapy.http.Response` object from the cache
+        :param request: `scrapy.Request` object
+        :return: True if the cached response is used without any request, else the request
+            is sent along with the validators of the cached response
+        """
+        max_age = self.max_age(request)
+        if max_age and self._compute_current_age(cachedresponse, request, time.time()) < max_age:
+            return True
+        return super().is_cached_response_fresh(cachedresponse, request)
@@ -21,13 +21,17 @@ For example:
 
 3. Update the `news_item` dict with required fields:
    news_item[ItemField.SOURCE.value] = <value>
+
+4. Carry a story known from a listing to its story page as a :py:class:`StoryStub`::
+   Request(url=url, callback=parser.parse_story, cb_kwargs={"story": StoryStub(url=url)})
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import re
-from typing import NoReturn, Union
+from typing import Iterable, NoReturn, Optional, Union
 
 import scrapy
+from scrapy.loader import ItemLoader
 from scrapy.loader.processors import MapCompose, TakeFirst
 
 
@@ -41,30 +45,80 @@ def clean_whitespace(value: str) -> str:
     return value.strip()
 
 
-def convert_date(date: Union[list, str]) -> datetime | NoReturn:
+# The news sites publish the times in Indian Standard Time
+IST = timezone(timedelta(hours=5, minutes=30), name="IST")
+
+
+class DateNormalizer:
     """
-    Extract data from the given input and convert it
-    to a required strctured format
-    :param date: Either a list or a string date to be processed
-    :return: a `datetime.datetime` object
+    Initializes a :py:class:`DateNormalizer` object.
+    Converts the dates published by the news sites to timezone aware `datetime.datetime`
+    objects. The format which parsed a date is remembered for the "shape" of that date
+    (the date with all the digits replaced), so the dates of the same shape are parsed with
+    a single `datetime.strptime` call instead of trying all the formats one by one.
+
+    ::return: a new :py:class:`DateNormalizer` object
     """
-    formats = [
+
+    FORMATS = (
         "%b %d, %Y %I:%M %p",
         "%B %d, %Y %I:%M %p",
         "%b %d, %Y %H:%M",
         "%B %d, %Y %H:%M",
-        "%b %d, %Y %H:%M IST",
-        "%B %d, %Y %H:%M IST",
-    ]
-    if not date:
-        raise ValueError(f"date string is wither empty or None: {date}")
-    for fmt in formats:
+    )
+    TIMEZONE_SUFFIX = re.compile(r"\s*\b(IST|UTC|GMT)$", re.IGNORECASE)
+    DIGITS = re.compile(r"\d")
+    MAX_SHAPES = 256
+
+    def __init__(self):
+        self.formats_by_shape = {}
+
+    def __call__(self, date: str) -> datetime:
+        """
+        :param date: date string to be processed
+        :return: a timezone aware `datetime.datetime` object
+        """
+        if not date:
+            raise ValueError(f"date string is wither empty or None: {date}")
+        suffix = self.TIMEZONE_SUFFIX.search(date)
+        text = date[: suffix.start()] if suffix else date
+        # Dates without any timezone are in IST as well
+        tzinfo = timezone.utc if suffix and suffix.group(1).upper() != "IST" else IST
+        shape = self.DIGITS.sub("0", text)
+        known_format = self.formats_by_shape.get(shape)
+        if known_format is not None:
+            try:
+                return datetime.strptime(text, known_format).replace(tzinfo=tzinfo)
+            except ValueError:
+                pass
         try:
-            dt_obj = datetime.strptime(date, fmt)
-            return dt_obj.strftime("%d-%m-%y %H-%M-%S")
+            # ISO 8601 timestamps, e.g. of JSON-LD, carry their own offset
+            dt_obj = datetime.fromisoformat(text)
+            return dt_obj if dt_obj.tzinfo else dt_obj.replace(tzinfo=tzinfo)
         except ValueError:
-            continue
-    raise ValueError(f"Unknown date format: {date}")
+            pass
+        for fmt in self.FORMATS:
+            try:
+                dt_obj = datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            if len(self.formats_by_shape) < self.MAX_SHAPES:
+                self.formats_by_shape[shape] = fmt
+            return dt_obj.replace(tzinfo=tzinfo)
+        raise ValueError(f"Unknown date format: {date}")
+
+
+normalize_date = DateNormalizer()
+
+
+def convert_date(date: Union[list, str]) -> datetime | NoReturn:
+    """
+    Extract data from the given input and convert it
+    to a required strctured format
+    :param date: Either a list or a string date to be processed
+    :return: a timezone aware `datetime.datetime` object
+    """
+    return normalize_date(date)
 
 
 def remove_escape_characters(text: str) -> str:
@@ -102,3 +156,57 @@ class NewsScrapperItem(scrapy.Item):
         input_processor=MapCompose(clean_whitespace, convert_date),
         output_processor=TakeFirst(),
     )
+    # Set by the storage pipeline: SimHash fingerprint of the title and the description,
+    # and the url and the distance of the story this one is a near-duplicate of
+    simhash = scrapy.Field()
+    duplicate_of = scrapy.Field()
+    distance = scrapy.Field()
+
+
+class StoryStub:
+    """
+    Initializes a :py:class:`StoryStub` object.
+    Story as known from a listing, carried in the `cb_kwargs` of the request for its story
+    page until the missing fields are read from that page. It holds the raw strings only,
+    no selector of the listing page, so thousands of pending story requests take little
+    memory and can be pickled to a disk queue. The item is loaded with :py:meth:`loader`.
+
+    ::return: a new :py:class:`StoryStub` object
+    """
+
+    __slots__ = ("source", "title", "url", "description", "date", "location")
+
+    def __init__(
+        self,
+        source: Optional[str] = None,
+        title: Optional[str] = None,
+        url: Optional[str] = None,
+        description: Optional[str] = None,
+        date: Optional[str] = None,
+        location: Optional[str] = None,
+    ):
+        self.source = source
+        self.title = title
+        self.url = url
+        self.description = description
+        self.date = date
+        self.location = location
+
+    def __repr__(self) -> str:
+        return f"StoryStub(source={self.source!r}, url={self.url!r})"
+
+    def missing(self, names: Iterable[str]) -> list[str]:
+        """
+        :param names: names of the required fields
+        :return: the names of the fields which are empty, as the loader would drop them
+        """
+        return [name for name in names if not (getattr(self, name) or "").strip()]
+
+    def loader(self) -> ItemLoader:
+        """
+        :return: `ItemLoader` of a `NewsScrapperItem` filled with the known fields
+        """
+        loader = ItemLoader(item=NewsScrapperItem())
+        for name in self.__slots__:
+            loader.add_value(name, getattr(self, name))
+        return loader
@@ -1,23 +1,70 @@
 """
-This module provides application logging functionality, its setup and configuration
+This module provides application logging functionality, its setup and configuration.
+
+The log records are only put on a queue by the logging thread, the JSON formatting and
+the file I/O happen on a background :py:class:`logging.handlers.QueueListener` thread,
+one per log file. Setting up the logging again for a logger or for a log file is a no-op,
+hence no handler is ever added twice.
 """
 
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
 import sys
+import threading
+from typing import IO, Union
 
 from pythonjsonlogger.json import JsonFormatter
 
+# log file name (or stream) -> handler putting the records on the queue of that file
+_QUEUE_HANDLERS = {}
+_LISTENERS = []
+_LOCK = threading.Lock()
+
+
+def _get_queue_handler(file_name: Union[str, IO]) -> QueueHandler:
+    """
+    Returns the queue handler for a log file, the background listener writing
+    the file is started on the first call for that file only.
+    :param file_name: File path (or stream) to dump the logs.
+    :return: `logging.handlers.QueueHandler` object
+    """
+    with _LOCK:
+        if file_name not in _QUEUE_HANDLERS:
+            if isinstance(file_name, str):
+                log_handler = logging.FileHandler(filename=file_name)
+            else:
+                log_handler = logging.StreamHandler(stream=file_name)
+            formatter = JsonFormatter(fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+            log_handler.setFormatter(formatter)
+            log_queue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, log_handler)
+            listener.start()
+            _LISTENERS.append(listener)
+            _QUEUE_HANDLERS[file_name] = QueueHandler(log_queue)
+        return _QUEUE_HANDLERS[file_name]
+
 
 def set_up_logging(logger: logging.Logger, log_level="INFO", file_name=sys.stdout):
     """
-    Creates and configures proper JSON logging
+    Creates and configures proper JSON logging. Can be called any number of times
+    for the same logger or the same file, the handlers are added only once.
 
     :param logger: The py:class:`logging.Logger` object.
     :param log_level: log level to set.
     :param file_name: File path to dump all the logs.
     """
-    log_handler = logging.FileHandler(filename=file_name)
-    formatter = JsonFormatter(fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    log_handler.setFormatter(formatter)
+    log_handler = _get_queue_handler(file_name=file_name)
     logger.setLevel(logging.getLevelName(log_level.upper()))
-    logger.addHandler(log_handler)
+    if log_handler not in logger.handlers:
+        logger.addHandler(log_handler)
+
+
+@atexit.register
+def stop_logging() -> None:
+    """Writes all the queued log records and stops the background listeners"""
+    with _LOCK:
+        while _LISTENERS:
+            _LISTENERS.pop().stop()
+        _QUEUE_HANDLERS.clear()
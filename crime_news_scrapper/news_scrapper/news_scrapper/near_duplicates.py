@@ -0,0 +1,246 @@
+"""
+This module provides near-duplicate detection of the crime stories, e.g. the same story
+published by different sources with slightly different titles.
+
+Every story gets a 64 bit SimHash fingerprint of its title and description. Two stories are
+near-duplicates when their fingerprints differ in at most `max_distance` bits. The
+fingerprints are looked up with locality sensitive hashing: a fingerprint is split into
+`max_distance + 1` bands, and near-duplicates always share at least one band exactly
+(pigeonhole principle), so only the stories in the same band buckets are compared.
+
+The fingerprints are computed, and large candidate buckets are compared, with numpy when it
+is installed, and in pure python otherwise. Both give exactly the same results.
+
+How To Use This Module
+======================
+
+For example:
+1. Import class :py:class:`NearDuplicateIndex`:
+   ``from news_scrapper.near_duplicates import NearDuplicateIndex, simhash``.
+
+2. Initialize the index:
+   near_duplicates = NearDuplicateIndex(max_distance=3)
+
+3. Look up a story and add it to the index:
+   fingerprint = simhash(title, description)
+   match = near_duplicates.find(fingerprint=fingerprint, url=url, source=source)
+   near_duplicates.add(fingerprint=fingerprint, url=url, source=source)
+"""
+
+from array import array
+from collections import Counter
+from functools import lru_cache
+import hashlib
+import logging
+import re
+import sys
+from typing import Iterable, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+# numpy >= 2.0 is needed to compare the fingerprints, older versions only compute them
+HAS_BITWISE_COUNT = np is not None and hasattr(np, "bitwise_count")
+
+FINGERPRINT_BITS = 64
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+# Fingerprints are stored in a signed BIGINT column
+SIGN_BIT = 1 << (FINGERPRINT_BITS - 1)
+MASK = (1 << FINGERPRINT_BITS) - 1
+
+
+@lru_cache(maxsize=65536)
+def hash_token(token: str) -> int:
+    """
+    :param token: a word of a story
+    :return: stable 64 bit hash of the token, the same in every process
+    """
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+def _simhash_numpy(hashes: list[int], weights: list[int]) -> int:
+    """Computes the fingerprint with one vectorized pass over all the token bits"""
+    bits = np.unpackbits(np.array(hashes, dtype=">u8").view(np.uint8)).reshape(
+        len(hashes), FINGERPRINT_BITS
+    )
+    votes = np.array(weights, dtype=np.int64) @ (bits.astype(np.int64) * 2 - 1)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+def _simhash_python(hashes: list[int], weights: list[int]) -> int:
+    """Computes the fingerprint bit by bit"""
+    votes = [0] * FINGERPRINT_BITS
+    for token_hash, weight in zip(hashes, weights):
+        for bit in range(FINGERPRINT_BITS):
+            if token_hash >> (FINGERPRINT_BITS - 1 - bit) & 1:
+                votes[bit] += weight
+            else:
+                votes[bit] -= weight
+    fingerprint = 0
+    for vote in votes:
+        fingerprint = fingerprint << 1 | (vote > 0)
+    return fingerprint
+
+
+def simhash(*texts: Optional[str]) -> int:
+    """
+    Computes the SimHash fingerprint of texts, case and punctuation insensitive. Every word
+    votes for the bits of its hash, weighted by the number of its occurrences.
+    :param texts: texts of a story, e.g. the title and the description
+    :return: unsigned 64 bit fingerprint, 0 for texts without any words
+    """
+    tokens = Counter(TOKEN_PATTERN.findall(" ".join(text for text in texts if text).lower()))
+    if not tokens:
+        return 0
+    hashes = [hash_token(token) for token in tokens]
+    weights = list(tokens.values())
+    if np is not None:
+        return _simhash_numpy(hashes, weights)
+    return _simhash_python(hashes, weights)
+
+
+def to_signed(fingerprint: int) -> int:
+    """:return: the fingerprint as a signed 64 bit integer, as stored in the database"""
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint & SIGN_BIT else fingerprint
+
+
+def to_unsigned(fingerprint: int) -> int:
+    """:return: the fingerprint as an unsigned 64 bit integer, as read from the database"""
+    return fingerprint & MASK
+
+
+def _bucket_size(bucket: Union[int, array]) -> int:
+    """:return: number of the stories in a bucket"""
+    return len(bucket) if isinstance(bucket, array) else 1
+
+
+class NearDuplicateIndex:
+    """
+    Initializes a :py:class:`NearDuplicateIndex` object.
+    Keeps the fingerprints of the known stories in memory in a compact form: the fingerprints
+    are held in an unsigned 64 bit array, and every band bucket maps to the position of its
+    only story, or to an unsigned 32 bit array of positions if several stories share it.
+
+    ::return: a new :py:class:`NearDuplicateIndex` object
+    """
+
+    # Buckets holding more candidates than this are compared with numpy, if installed
+    VECTORIZE_FROM = 32
+
+    def __init__(
+        self,
+        max_distance: int = 3,
+        cross_source_only: bool = False,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param max_distance: maximum number of differing bits of near-duplicate fingerprints
+        :param cross_source_only: only stories of different sources are near-duplicates
+        :param logger: `logging.Logger` object
+        """
+        self.log = logger or logging.getLogger()
+        self.max_distance = max_distance
+        self.cross_source_only = cross_source_only
+        bands = max_distance + 1
+        # (shift, mask) of every band, the bands cover all the bits
+        bounds = [FINGERPRINT_BITS * band // bands for band in range(bands + 1)]
+        self.bands = [
+            (bounds[band], (1 << (bounds[band + 1] - bounds[band])) - 1) for band in range(bands)
+        ]
+        self.fingerprints = array("Q")
+        self.urls = []
+        # Source names are interned, there are only a handful of them
+        self.sources = []
+        self.buckets = {}
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def _keys(self, fingerprint: int) -> Iterable[tuple[int, int]]:
+        """:return: the bucket keys of the bands of a fingerprint"""
+        for band, (shift, mask) in enumerate(self.bands):
+            yield band, fingerprint >> shift & mask
+
+    def add(self, fingerprint: int, url: str, source: Optional[str]) -> None:
+        """
+        Adds the fingerprint of a story to the index.
+        :param fingerprint: unsigned 64 bit fingerprint of the story
+        :param url: url of the story
+        :param source: source of the story
+        """
+        if not fingerprint:
+            return
+        position = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        self.urls.append(url)
+        self.sources.append(sys.intern(source) if source else source)
+        for key in self._keys(fingerprint):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                self.buckets[key] = position
+            elif isinstance(bucket, array):
+                bucket.append(position)
+            else:
+                self.buckets[key] = array("I", (bucket, position))
+
+    def add_many(self, entries: Iterable[tuple[int, str, Optional[str]]]) -> int:
+        """
+        Adds the fingerprints of many stories to the index.
+        :param entries: iterable of (fingerprint, url, source) tuples
+        :return: number of fingerprints added
+        """
+        count = len(self)
+        for fingerprint, url, source in entries:
+            self.add(fingerprint=fingerprint, url=url, source=source)
+        return len(self) - count
+
+    def _candidates(self, fingerprint: int) -> list[tuple[int, int]]:
+        """
+        :param fingerprint: unsigned 64 bit fingerprint of a story
+        :return: (distance, position) of the stories within `max_distance`, closest first
+        """
+        buckets = [
+            bucket
+            for bucket in map(self.buckets.get, self._keys(fingerprint))
+            if bucket is not None
+        ]
+        if HAS_BITWISE_COUNT and sum(map(_bucket_size, buckets)) > self.VECTORIZE_FROM:
+            positions = np.unique(
+                np.concatenate([np.asarray(bucket, dtype=np.uint32).ravel() for bucket in buckets])
+            )
+            fingerprints = np.frombuffer(self.fingerprints, dtype=np.uint64)[positions]
+            distances = np.bitwise_count(fingerprints ^ np.uint64(fingerprint))
+            close = distances <= self.max_distance
+            matches = zip(distances[close].tolist(), positions[close].tolist())
+        else:
+            positions = set()
+            for bucket in buckets:
+                positions.update(bucket if isinstance(bucket, array) else (bucket,))
+            matches = (
+                ((self.fingerprints[position] ^ fingerprint).bit_count(), position)
+                for position in positions
+            )
+            matches = [match for match in matches if match[0] <= self.max_distance]
+        return sorted(matches)
+
+    def find(
+        self, fingerprint: int, url: Optional[str] = None, source: Optional[str] = None
+    ) -> Optional[tuple[str, int]]:
+        """
+        Finds the closest near-duplicate of a story, other than the story itself.
+        :param fingerprint: unsigned 64 bit fingerprint of the story
+        :param url: url of the story
+        :param source: source of the story
+        :return: (url, distance) of the closest near-duplicate, None if there is none
+        """
+        if not fingerprint:
+            return None
+        for distance, position in self._candidates(fingerprint):
+            if self.urls[position] == url:
+                continue
+            if self.cross_source_only and self.sources[position] == source:
+                continue
+            return self.urls[position], distance
+        return None
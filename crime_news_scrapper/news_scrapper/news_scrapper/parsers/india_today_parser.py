@@ -19,17 +19,18 @@ How To Use This Module
 """
 
 import json
-from typing import Iterable, Iterator
+import re
+from typing import Any, Iterable, Iterator, Optional
 
 import scrapy
 from scrapy.http import Request
 from scrapy.http import TextResponse
-from scrapy.loader import ItemLoader
+from twisted.python.failure import Failure
 
-from config import get_config_path, load_config
-from ..items import NewsScrapperItem
+from config import get_config
+from ..items import NewsScrapperItem, StoryStub
 from ..parsers.news_website_parser import NewsWebsiteParser
-from ..const import ItemField
+from ..const import ItemField, RequestType
 
 
 class IndiaTodayParser(NewsWebsiteParser):
@@ -43,24 +44,20 @@ class IndiaTodayParser(NewsWebsiteParser):
 
     CLICKS = 0
     LOAD_MORE_CLICKS = 0
+    CITY_URL_PATTERN = re.compile(r"^https://www\.indiatoday\.in/cities/([^/]+)/story/")
+    STORY_PAGE_PATTERNS = (rb'Story_stryloction__IUgpi">.*?</span>', rb'strydate">.*?</span>')
 
     def __init__(self):
         """
         Reads the config and initializes basic parsing logic
         """
-        config_path = get_config_path()
-        config = load_config(config_path=config_path)
-        self.config = config.get("india_today_parser", {})
-        logger_level = "INFO"
-        logger_path = "india_today.log"
-        if self.config:
-            logger_level = self.config.get("log_level", "INFO")
-            logger_path = self.config.get(
-                "file_name",
-                "india_today.log",
-            )
-        super().__init__(log_level=logger_level, file_name=logger_path)
+        self.config = get_config().india_today_parser
+        super().__init__(log_level=self.config.log_level, file_name=self.config.file_name)
         self.source = "INDIATODAY"
+        # The "load more" pages requested but not loaded yet, and the last page to load
+        # once a page tells that there is nothing more to load
+        self.pending_pages = set()
+        self.last_page = None
 
     def parse_front_page(self, response: TextResponse) -> Iterator[Request]:
         """
@@ -76,39 +73,68 @@ class IndiaTodayParser(NewsWebsiteParser):
         # This will parse the front page of indiatoday crime page. xpath selector value
         # "article" will give list of stories. Iterating those can give value for
         # story title, story url and the description by using appropriate selector.
-        for crime_news in response.xpath(".//article"):
-            loader = ItemLoader(item=NewsScrapperItem(), selector=crime_news)
-            loader.add_value(ItemField.SOURCE.value, self.source)
-            loader.add_xpath(ItemField.TITLE.value, "./div/div/a/@title")
-            loader.add_xpath(ItemField.URL.value, "./div/div/a/@href")
-            loader.add_xpath(ItemField.DESCRIPTION.value, "./div/div/div/p/text()")
-            if loader.get_output_value(ItemField.URL.value) is not None:
-                # Again make a request to a specific story in order to get the date and
-                # the location associated with it. Pass already created news_item dictionary
-                # as its meta field which will be passed in the next request and will be available
-                # in the response so that same dictionary can be updated for location and date.
-                # filter duplicate links hence dont_filter=False
-                self.logger.debug(
-                    f"Fetching the data from the story: "
-                    f"{loader.get_output_value(ItemField.URL.value)}"
-                )
-                yield response.follow(
-                    url=loader.get_output_value(ItemField.URL.value),
-                    callback=self.parse_story,
-                    meta={"loader": loader},
-                    dont_filter=False,
+        # In a sharded crawl only the first shard parses the stories of the front page
+        crime_stories = response.xpath(".//article") if self.owns_front_page() else []
+        new_stories, known_stories = 0, 0
+        for crime_news in crime_stories:
+            story = StoryStub(
+                source=self.source,
+                title=crime_news.xpath("./div/div/a/@title").get(),
+                url=crime_news.xpath("./div/div/a/@href").get(),
+                description=crime_news.xpath("./div/div/div/p/text()").get(),
+            )
+            if self.is_known(story.url):
+                self.logger.debug("This story is already stored, hence skipping: %s", story.url)
+                known_stories += 1
+                continue
+            if story.url is not None:
+                new_stories += 1
+                # The front page lacks the date of a story, hence make a request to the story
+                # in order to get the date and the location associated with it. Pass the
+                # story known so far along with the request, it is completed from the
+                # response of the story page.
+                yield self.complete_or_follow(
+                    response=response, story=story, callback=self.parse_story
                 )
 
+        # In incremental mode there is nothing new to load once the front page
+        # holds only already stored stories.
+        if self.reached_known_stories(new_stories=new_stories, known_stories=known_stories):
+            self.logger.info("Front page holds only already stored stories, not loading more")
+            return
         # Handle the "load more" contents using ajax call.
         # filter duplicate links using dont_filter=False
         self.logger.info("Loading more contents...")
-        # This is the exact call which gets executed after clicking load more.
-        # Executes callback self.parse_more_content after successful request execution.
-        ajax_url = "https://www.indiatoday.in/api/ajax/loadmorecontent"
-        page = 1
-        pagepath = "/crime"
-        yield scrapy.FormRequest(
-            url=ajax_url,
+        # A resumed crawl continues from the page its previous run was loading, the pages
+        # of the window are requested again even though that run has already requested them.
+        cursor = self.resume_cursor()
+        if cursor:
+            page, pagepath = cursor["page"], cursor["pagepath"]
+        else:
+            page, pagepath = self.first_shard_page(1), "/crime"
+        self.pending_pages, self.last_page = set(), None
+        # Request a window of pages at once, each of them requests the page a window ahead
+        # of it once loaded, so that the pages are downloaded concurrently.
+        for _ in range(self.config.load_more_window):
+            yield self.load_more_request(page=page, pagepath=pagepath, dont_filter=bool(cursor))
+            page = self.next_shard_page(page)
+
+    def load_more_request(
+        self, page: int, pagepath: str, dont_filter: bool = False
+    ) -> scrapy.FormRequest:
+        """
+        This is the exact call which gets executed after clicking load more. Executes
+        callback self.parse_more_content after successful request execution. The first
+        page not loaded yet is saved as the pagination cursor of the source.
+        :param page: number of the page to load
+        :param pagepath: path of the listing, e.g. "/crime"
+        :param dont_filter: whether to request the page even if it was already requested
+        :return: `scrapy.FormRequest` object for the page
+        """
+        self.pending_pages.add(page)
+        self.update_cursor(pagepath=pagepath)
+        return scrapy.FormRequest(
+            url="https://www.indiatoday.in/api/ajax/loadmorecontent",
             method="GET",
             formdata={
                 "page": str(page),
@@ -116,8 +142,13 @@ class IndiaTodayParser(NewsWebsiteParser):
                 "pagetype": "story/photo_gallery/video/breaking_news",
             },
             callback=self.parse_more_content,
-            meta={"page": page, "pagepath": pagepath},
-            dont_filter=False,
+            errback=self.load_more_failed,
+            meta={
+                "page": page,
+                "pagepath": pagepath,
+                "request_type": RequestType.AJAX.value,
+            },
+            dont_filter=dont_filter,
         )
 
     def parse_more_content(self, response: scrapy.FormRequest) -> Iterable[Request]:
@@ -134,73 +165,156 @@ class IndiaTodayParser(NewsWebsiteParser):
             "this article is no longer available",
             "this story is no longer available",
         ]
-        data = json.loads(response.text)
+        page = response.meta["page"]
+        self.pending_pages.discard(page)
+        try:
+            data = json.loads(response.text)
+        except ValueError as err:
+            self.give_up_page(page=page, pagepath=response.meta["pagepath"], reason=err)
+            return
         new_stories = data.get("data", {}).get("content", {})
+        new_count, known_count = 0, 0
         for new_story in new_stories:
             title = new_story.get("title")
             if title.lower() in stories_to_skip:
                 self.logger.debug(
-                    f"This story is not available, hence skipping: {new_story.get("canonical_url")}"
+                    "This story is not available, hence skipping: %s",
+                    new_story.get("canonical_url"),
                 )
                 continue
-            loader = ItemLoader(item=NewsScrapperItem(), selector=new_story)
-            loader.add_value(ItemField.SOURCE.value, self.source)
-            loader.add_value(ItemField.TITLE.value, title)
-            loader.add_value(ItemField.DESCRIPTION.value, new_story.get("description_short"))
-            loader.add_value(ItemField.URL.value, new_story.get("canonical_url"))
-
-            if loader.get_output_value(ItemField.URL.value) is not None:
-                # Again make a request to a specific story in order to get the date and
-                # the location associated with it.
-                # filter duplicate links
-                yield response.follow(
-                    url=loader.get_output_value(ItemField.URL.value),
-                    callback=self.parse_story,
-                    meta={"loader": loader},
-                    dont_filter=False,
+            story = StoryStub(
+                source=self.source,
+                title=title,
+                url=new_story.get("canonical_url"),
+                description=new_story.get("description_short"),
+                # Publish time of the story, e.g. "2025-01-01T00:15:00+05:30"
+                date=new_story.get("datetime_published"),
+            )
+
+            if self.is_known(story.url):
+                self.logger.debug("This story is already stored, hence skipping: %s", story.url)
+                known_count += 1
+                continue
+            if story.url is not None:
+                new_count += 1
+                # The stories of the cities are complete with the publish time, make a
+                # request to a specific story only in order to get the location of the others.
+                yield self.complete_or_follow(
+                    response=response, story=story, callback=self.parse_story
                 )
 
         # Keep checking if there are contents to load and if yes, load and
         # get its data similarly. filter duplicate links
-        IndiaTodayParser.LOAD_MORE_CLICKS = response.meta["page"]
-        self.logger.debug(f"Loading page: {response.meta['page'] + 1}")
-        if (
-            data.get("data", {}).get("is_load_more", "")
-            and data.get("data", {}).get("is_load_more") == 1
-        ):
-            ajax_url = "https://www.indiatoday.in/api/ajax/loadmorecontent"
-            page = response.meta["page"] + 1
-            pagepath = response.meta["pagepath"]
-            yield scrapy.FormRequest(
-                url=ajax_url,
-                method="GET",
-                formdata={
-                    "page": str(page),
-                    "pagepath": pagepath,
-                    "pagetype": "story/photo_gallery/video/breaking_news",
-                },
-                callback=self.parse_more_content,
-                meta={"page": page, "pagepath": pagepath},
-                dont_filter=True,
-            )
+        IndiaTodayParser.LOAD_MORE_CLICKS = max(IndiaTodayParser.LOAD_MORE_CLICKS, page)
+        if self.reached_known_stories(new_stories=new_count, known_stories=known_count):
+            self.logger.info(f"Page {page} holds only already stored stories, not loading more")
+            self.stop_loading_at(page=page)
+        elif data.get("data", {}).get("is_load_more") != 1:
+            self.stop_loading_at(page=page)
+        # A shard loading every nth page only stops at the first page past the last one.
+        # The pages before the last one are still loaded, so that the window leaves no gaps.
+        next_page = self.next_shard_page(page, pages_ahead=self.config.load_more_window)
+        if self.last_page is None or next_page < self.last_page:
+            self.logger.debug("Loading page: %s", next_page)
+            yield self.load_more_request(page=next_page, pagepath=response.meta["pagepath"])
+        else:
+            self.update_cursor(pagepath=response.meta["pagepath"])
+
+    def load_more_failed(self, failure: Failure) -> Iterable[Request]:
+        """
+        Errback of the load more requests, e.g. after the retries of a download failed or
+        on an HTTP error response. The pages after the failed one are not loaded.
+        :param failure: `twisted.python.failure.Failure` of the request
+        :return: empty iterable
+        """
+        meta = failure.request.meta
+        self.give_up_page(page=meta["page"], pagepath=meta["pagepath"], reason=failure.value)
+        return []
 
-    def parse_story(self, response: TextResponse) -> Iterable[NewsScrapperItem]:
+    def give_up_page(self, page: int, pagepath: str, reason: Any) -> None:
+        """
+        Stops loading the pages at a page which could not be loaded. As the chain of the
+        pages of the window through it is broken, the pages after it are not loaded, so
+        that no page is left out in between the loaded ones.
+        :param page: number of the page which could not be loaded
+        :param pagepath: path of the listing, e.g. "/crime"
+        :param reason: error of the page
+        """
+        self.logger.error(f"Could not load page {page}, not loading the pages after it: {reason}")
+        self.pending_pages.discard(page)
+        self.stop_loading_at(page=page)
+        self.update_cursor(pagepath=pagepath)
+
+    def request_dropped(self, request: Request) -> None:
+        """
+        Forgets a load more page dropped by the scheduler, e.g. a page requested again by a
+        crawl resumed from its job directory, whose pending pages were resumed as well.
+        :param request: the dropped `scrapy.Request` object
+        """
+        if request.meta.get("request_type") == RequestType.AJAX.value:
+            self.pending_pages.discard(request.meta["page"])
+            self.update_cursor(pagepath=request.meta["pagepath"])
+
+    def stop_loading_at(self, page: int) -> None:
+        """
+        Shrinks the window of the pages to load once a page is the last one to load. The
+        pages of the window past it which were already requested load no further pages.
+        :param page: number of the last page to load
+        """
+        if self.last_page is None or page < self.last_page:
+            self.last_page = page
+
+    def update_cursor(self, pagepath: str) -> None:
+        """
+        Saves the first page requested but not loaded yet as the pagination cursor, or
+        forgets the cursor once all the pages up to the last one are loaded.
+        :param pagepath: path of the listing, e.g. "/crime"
+        """
+        pages = [
+            page for page in self.pending_pages if self.last_page is None or page <= self.last_page
+        ]
+        if pages:
+            self.save_cursor(page=min(pages), pagepath=pagepath)
+        else:
+            self.clear_cursor()
+
+    def can_shard_pages(self) -> bool:
+        """
+        :return: True, the shards load the AJAX pages by their numbers
+        """
+        return True
+
+    def parse_story(self, response: TextResponse, story: StoryStub) -> Iterable[NewsScrapperItem]:
         """
         Extracts required details from a specific story using xpath
-        selectors. A consecutive item object is updated with new required information.
+        selectors. The story known from the listing is completed with new required information.
 
         :param response: An instance of `scrapy.http.TextResponse`
+        :param story: `StoryStub` of the story, as filled from the listing
         :return: Iterable of `NewsScrapperItem` object
         """
         # Parse story content using xpath selectors to get story date and the location.
         IndiaTodayParser.CLICKS += 1
-        loader = response.meta["loader"]
-        location = response.xpath(
+        loader = story.loader()
+        loader.add_value(ItemField.LOCATION.value, self.extract_location(response=response))
+        # The date known from the listing is kept, the page is read for the location only
+        if not story.date:
+            loader.add_value(ItemField.DATE.value, self.extract_date(response=response))
+        yield loader.load_item()
+
+    def extract_date(self, response: TextResponse) -> Optional[str]:
+        """
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: the date shown on the story page, None if not found
+        """
+        date = response.xpath(".//span[@class='jsx-ace90f4eca22afc7 strydate']/text()").getall()
+        return date[2] if len(date) > 2 else None
+
+    def extract_location(self, response: TextResponse) -> Optional[str]:
+        """
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: the location shown on the story page
+        """
+        return response.xpath(
             ".//span[@class='jsx-ace90f4eca22afc7 Story_stryloction__IUgpi']/text()"
         ).get()
-        date = response.xpath(".//span[@class='jsx-ace90f4eca22afc7 strydate']/text()").extract()
-        loader.add_value(ItemField.LOCATION.value, location)
-        if date:
-            date = date[2]
-        loader.add_value(ItemField.DATE.value, date)
-        yield loader.load_item()
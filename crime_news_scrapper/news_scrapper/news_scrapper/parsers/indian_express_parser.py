@@ -3,6 +3,12 @@ This module helps in parsing the response for `www.indianexpress.com/about/crime
 page. Each crime story from the response will be parsed in order to get required items
 and those items will be returned one by one.
 
+The stories of a listing page are extracted from the server rendered page without any
+JavaScript: from the embedded JSON-LD, from the embedded `__NEXT_DATA__` JSON or else from
+the HTML. The RSS feed of the listing can be read as well. Splash, which renders the page in a
+headless browser, is only used in the "splash" pagination mode or as a fallback when nothing
+could be extracted from the first listing page.
+
 How To Use This Module
 ======================
 
@@ -17,17 +23,20 @@ How To Use This Module
 
 """
 
-from typing import Iterable, Union
+from email.utils import parsedate_to_datetime
+import json
+import re
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
 
 from scrapy_splash import SplashRequest
 from scrapy.http import Request
 from scrapy.http import TextResponse
-from scrapy.loader import ItemLoader
+from w3lib.html import remove_tags
 
-from config import get_config_path, load_config
-from ..items import NewsScrapperItem
+from config import get_config
+from ..items import NewsScrapperItem, StoryStub
 from ..parsers.news_website_parser import NewsWebsiteParser
-from ..const import ItemField
+from ..const import ItemField, RequestType
 
 
 class IndianExpressParser(NewsWebsiteParser):
@@ -41,27 +50,38 @@ class IndianExpressParser(NewsWebsiteParser):
 
     LOAD_MORE_CLICKS = 0
     CLICKS = 0
+    # Only the links to the stories are extracted from the embedded JSON
+    STORY_URL_PATTERN = "/article/"
+    CITY_URL_PATTERN = re.compile(r"/article/cities/([^/]+)/")
+    STORY_PAGE_PATTERNS = (rb'itemprop="dateModified".*?</span>',)
 
     def __init__(self):
         """
         Reads the config and initializes basic parsing logic
         """
-        config_path = get_config_path()
-        config = load_config(config_path=config_path)
-        self.config = config.get("indian_express_parser", {})
-        logger_level = "INFO"
-        logger_path = "indian_express.log"
-        if self.config:
-            logger_level = self.config.get("log_level", "INFO")
-            logger_path = self.config.get("file_name", "indian_express.log")
-        super().__init__(log_level=logger_level, file_name=logger_path)
+        self.config = get_config().indian_express_parser
+        super().__init__(log_level=self.config.log_level, file_name=self.config.file_name)
         self.seen_urls = set()
         self.source = "TheIndianEXPRESS"
+        # "direct" reads the paged listing over plain HTTP, "splash" clicks "Load more"
+        self.pagination = self.config.pagination
+        # Maximum number of listing pages to read or "Load more" clicks, 0 for no limit
+        self.max_pages = self.config.max_pages
+        self.max_clicks = self.config.max_clicks
+        self.splash_timeout = self.config.splash_timeout
+        # Render the listing with Splash if nothing could be extracted without it
+        self.splash_fallback = self.config.splash_fallback
+        self.feed_url = self.config.feed_url
+        # Number of listings extracted by each extraction method
+        self.extracted = {}
 
     # Lua script to handle button click event for Load more button on the web page
     # This script checks for the button with id ""button#load_tag_article", if present
-    # will perform mouse click event till the last load more is not hit and after this
-    # will return whole html data that was loaded by all these clicks.
+    # will perform mouse click event till the last load more is not hit or `args.max_clicks`
+    # clicks are done. After every click it waits only till the new stories are loaded
+    # and it returns the html of the loaded stories instead of the whole page.
+    # In incremental mode `args.known_urls` holds the newest stored story URLs and the
+    # clicking stops as soon as any of them is loaded, as all the older stories are known.
     lua_script = """
     function main(splash, args)
         -- Set the user agent
@@ -70,58 +90,239 @@ class IndianExpressParser(NewsWebsiteParser):
             "Chrome/91.0.4472.124 Safari/537.36"
         )
 
-        -- Navigate to the provided URL
+        local max_clicks = args.max_clicks or 0
+        local wait_timeout = args.wait_timeout or 10
+        local poll_interval = args.poll_interval or 0.25
+
+        -- Counts the stories loaded on the page
+        local count_stories = splash:jsfunc([[
+            function() {
+                return document.querySelectorAll("div.details").length;
+            }
+        ]])
+
+        -- Waits till more than `count` stories are loaded or `wait_timeout` seconds passed
+        local function wait_for_stories(count)
+            local waited = 0
+            while count_stories() <= count and waited < wait_timeout do
+                assert(splash:wait(poll_interval))
+                waited = waited + poll_interval
+            end
+            return count_stories() > count
+        end
+
+        -- Checks whether any of the already stored stories is loaded on the page
+        local has_known_story = splash:jsfunc([[
+            function(known_urls) {
+                var links = document.querySelectorAll("div.details h3 a");
+                for (var i = 0; i < links.length; i++) {
+                    if (known_urls.indexOf(links[i].getAttribute("href")) !== -1) {
+                        return true;
+                    }
+                }
+                return false;
+            }
+        ]])
+        local known_urls = args.known_urls or {}
+
+        -- Navigate to the provided URL and wait for the first stories
         assert(splash:go(args.url))
-        assert(splash:wait(3))  -- Wait for the page to fully load
+        wait_for_stories(0)
 
-        -- Initialize variables
-        local previous_content = ""
-        local current_content = splash:html()
         local click_count = 0  -- Counter for how many times the button was clicked
 
         -- Loop to click the "Load More" button until no new content is loaded
-        while previous_content ~= current_content do
-            previous_content = current_content
+        while max_clicks == 0 or click_count < max_clicks do
+            if #known_urls > 0 and has_known_story(known_urls) then
+                break  -- Exit as the rest of the stories are already stored
+            end
 
             -- Select the "Load More" button using its class or ID
             local button = splash:select("button#load_tag_article")  -- Using ID selector
-            if button then
-                button:mouse_click()  -- Simulate the button click
-                assert(splash:wait(3))  -- Wait for the new content to load
-                click_count = click_count + 1
-            else
+            if not button then
                 break  -- Exit if the button is not found
             end
-
-            -- Update the current page content
-            current_content = splash:html()
+            local loaded_stories = count_stories()
+            button:mouse_click()  -- Simulate the button click
+            click_count = click_count + 1
+            if not wait_for_stories(loaded_stories) then
+                break  -- Exit if no new content was loaded
+            end
         end
 
-        -- Return the final loaded page content
+        -- Return only the loaded stories instead of the whole page content
+        local stories = splash:evaljs([[
+            Array.prototype.map.call(
+                document.querySelectorAll("div.details"),
+                function(story) { return story.outerHTML; }
+            ).join("")
+        ]])
         return {
-            html = splash:html(),
+            html = "<html><body>" .. stories .. "</body></html>",
             click_count = click_count,
         }
         end
     """
 
-    def parse_front_page(self, response: TextResponse) -> SplashRequest:
+    def parse_front_page(
+        self, response: TextResponse
+    ) -> Iterable[Union[NewsScrapperItem, Request, SplashRequest]]:
         """
-        This method uses scrapy-splash framework and sends a SplashRequest to
-        first load all the contents(executes all load more) from the response page
-        using a lua script. After that, given callback will be executed for further parsing.
+        In "splash" pagination mode this method uses scrapy-splash framework and sends a
+        SplashRequest to first load all the contents(executes all load more) from the response
+        page using a lua script. After that, given callback will be executed for further parsing.
+        In "direct" pagination mode the response is parsed as the first listing page and the
+        subsequent listing pages are requested over plain HTTP.
+        If `feed_url` is configured, the RSS feed of the listing is requested as well.
         :param response: An instance of `scrapy.http.TextResponse`
-        ::return: An iterable of `scrapy_splash.SplashRequest` response
+        ::return: An iterable of `scrapy_splash.SplashRequest` or `scrapy.http.Request`
+            or `NewsScrapperItem` objects
+        """
+        if self.feed_url and self.owns_front_page():
+            self.logger.info(f"Reading the RSS feed: {self.feed_url}")
+            yield Request(
+                url=self.feed_url,
+                callback=self.parse_feed,
+                meta={"request_type": RequestType.FEED.value},
+            )
+        if self.pagination == "direct":
+            self.logger.info(f"Reading the paged listing from {self.source.lower()}.com page")
+            # A resumed crawl continues from the page its previous run was loading, which is
+            # requested again even though that run has already requested it.
+            cursor = self.resume_cursor()
+            if cursor:
+                yield self.listing_page_request(
+                    response=response,
+                    url=cursor["url"],
+                    page=cursor["page"],
+                    listing_url=cursor["listing_url"],
+                    dont_filter=True,
+                )
+            if self.owns_front_page():
+                yield from self.parse_listing_page(response=response)
+                return
+            # The other shards of a sharded crawl start from their own first page
+            page = self.first_shard_page(1)
+            yield self.listing_page_request(
+                response=response,
+                url=self.page_url(listing_url=response.url, page=page),
+                page=page,
+                listing_url=response.url,
+            )
+            return
+        yield self.splash_request(url=response.url)
+
+    def splash_request(self, url: str) -> SplashRequest:
+        """
+        :param url: url of the listing
+        :return: `scrapy_splash.SplashRequest` loading all the stories of the listing
         """
         # sends a splash request to already load the data from load more
         self.logger.info(
             f"Sending the splash request to load all the data from {self.source.lower()}.com page"
         )
-        yield SplashRequest(
-            url=response.url,
+        return SplashRequest(
+            url=url,
             callback=self.parse_data,
             endpoint="execute",
-            args={"lua_source": self.lua_script, "timeout": 3000},
+            args={
+                "lua_source": self.lua_script,
+                "timeout": self.splash_timeout,
+                "max_clicks": self.max_clicks,
+                "known_urls": self.watermark(),
+            },
+        )
+
+    def parse_listing_page(
+        self, response: TextResponse
+    ) -> Iterable[Union[NewsScrapperItem, Request]]:
+        """
+        Parses a single page of the server rendered listing and requests the next page
+        till a page without any stories, the `max_pages` limit or, in incremental mode,
+        a page with only already stored stories is reached.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: Iterable of `NewsScrapperItem` object or Iterable of `scrapy.http.Request` object
+        """
+        page = response.meta.get("page", 1)
+        IndianExpressParser.LOAD_MORE_CLICKS = page - 1
+        outputs, stories, known_stories = self.parse_stories(response=response)
+        yield from outputs
+        if not stories:
+            if page == 1 and self.splash_fallback:
+                self.logger.warning("No stories extracted from the listing, rendering it instead")
+                yield self.splash_request(url=response.url)
+                return
+            self.logger.info(f"No stories on listing page {page}, not loading more")
+            self.clear_cursor()
+            return
+        if self.reached_known_stories(new_stories=len(outputs), known_stories=known_stories):
+            self.logger.info(f"Page {page} holds only already stored stories, not loading more")
+            self.clear_cursor()
+            return
+        next_page = self.next_shard_page(page)
+        if self.max_pages and next_page > self.max_pages:
+            self.logger.info(f"Reached the maximum of {self.max_pages} listing pages")
+            self.clear_cursor()
+            return
+        # Prefer the pagination link of the page itself, else build the paged url. A shard
+        # of a sharded crawl skips the pages of the other shards, so it builds the url.
+        listing_url = response.meta.get("listing_url", response.url)
+        next_url = None
+        if self.shard_count == 1:
+            next_url = response.xpath(
+                "//link[@rel='next']/@href | //a[contains(@class, 'next')]/@href"
+            ).get()
+        if not next_url:
+            next_url = self.page_url(listing_url=listing_url, page=next_page)
+        self.logger.debug("Loading listing page: %s", next_page)
+        yield self.listing_page_request(
+            response=response, url=next_url, page=next_page, listing_url=listing_url
+        )
+
+    def page_url(self, listing_url: str, page: int) -> str:
+        """
+        :param listing_url: url of the first page of the listing
+        :param page: number of a page of the listing
+        :return: url of the page, e.g. ".../crime-news/page/2/"
+        """
+        return f"{listing_url.rstrip('/')}/page/{page}/"
+
+    def can_shard_pages(self) -> bool:
+        """
+        :return: True in the "direct" pagination mode, in which the shards load the listing
+            pages by their numbers, False in the "splash" mode
+        """
+        return self.pagination == "direct"
+
+    def listing_page_request(
+        self,
+        response: TextResponse,
+        url: str,
+        page: int,
+        listing_url: str,
+        dont_filter: bool = False,
+    ) -> Request:
+        """
+        Requests a page of the server rendered listing and saves it as the pagination
+        cursor of the source.
+        :param response: An instance of `scrapy.http.TextResponse` linking to the page
+        :param url: url of the page
+        :param page: number of the page
+        :param listing_url: url of the first page of the listing
+        :param dont_filter: whether to request the page even if it was already requested
+        :return: `scrapy.http.Request` object for the page
+        """
+        url = response.urljoin(url)
+        self.save_cursor(page=page, url=url, listing_url=listing_url)
+        return Request(
+            url=url,
+            callback=self.parse_listing_page,
+            meta={
+                "page": page,
+                "listing_url": listing_url,
+                "request_type": RequestType.LISTING.value,
+            },
+            dont_filter=dont_filter,
         )
 
     def parse_data(self, response: TextResponse) -> Iterable[Union[NewsScrapperItem, Request]]:
@@ -135,50 +336,224 @@ class IndianExpressParser(NewsWebsiteParser):
         """
         IndianExpressParser.LOAD_MORE_CLICKS = response.data.get("click_count", 0)
         self.logger.info(f"Total Load more clicks: {IndianExpressParser.LOAD_MORE_CLICKS}")
-        # once load more is done, response is received and parsed in order to get title, url,
-        # description, location and the date of the story using xpath selectors.
-        for story in response.xpath("//div[@class='details']"):
-            loader = ItemLoader(item=NewsScrapperItem(), selector=story)
-            url = story.xpath("./div/h3/a/@href").get()
+        outputs, _, _ = self.parse_stories(response=response)
+        yield from outputs
+
+    def parse_stories(
+        self, response: TextResponse
+    ) -> tuple[list[Union[NewsScrapperItem, Request]], int, int]:
+        """
+        Extracts required details of each story from a listing response, see
+        :py:meth:`extract_stories`. Each story response will be modelled as an instance of
+        `NewsScrapperItem`. If certain information is not available, makes a scrapy request
+        again to each specific story url.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: tuple of the list of `NewsScrapperItem` or `scrapy.http.Request` objects for the
+            new stories, the number of stories on the page and the number of already stored ones
+        """
+        stories = self.extract_stories(response=response)
+        outputs, known_stories = self.build_outputs(response=response, stories=stories)
+        return outputs, len(stories), known_stories
+
+    def build_outputs(
+        self, response: TextResponse, stories: list[dict]
+    ) -> tuple[list[Union[NewsScrapperItem, Request]], int]:
+        """
+        Models the new stories as `NewsScrapperItem` objects, or as requests to the story
+        pages if the location (not known from its url) or the date of a story is missing.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :param stories: dicts of the url, title, description and date of the stories
+        :return: tuple of the list of `NewsScrapperItem` or `scrapy.http.Request` objects for the
+            new stories and the number of already stored stories
+        """
+        outputs = []
+        known_stories = 0
+        for story in stories:
+            url = story.get("url")
             # Keep a track of already visited URLs in order to avoid duplication.
             if self.seen_urls:
                 if url in self.seen_urls:
-                    self.logger.info(f"This data is already scrapped: {url}. Hence continuing...")
+                    self.logger.info("This data is already scrapped: %s. Hence continuing...", url)
                     continue
-            date = story.xpath("./div/p/text()").get()
-            loader.add_value(ItemField.SOURCE.value, self.source)
-            loader.add_xpath(ItemField.TITLE.value, "./div/h3/a/text()")
-            loader.add_value(ItemField.URL.value, url)
-            loader.add_value(ItemField.DATE.value, date)
-            loader.add_xpath(ItemField.DESCRIPTION.value, "./div/p[position()=2]/text()")
+            # Skip the stories already stored by the previous crawls
+            if self.is_known(url):
+                self.logger.debug("This story is already stored, hence skipping: %s", url)
+                known_stories += 1
+                continue
+            stub = StoryStub(
+                source=self.source,
+                title=story.get("title"),
+                url=url,
+                description=story.get("description"),
+                date=story.get("date"),
+            )
 
             self.seen_urls.add(url)
             if url:
-                if "/article/cities" in url:
-                    loader.add_value(ItemField.LOCATION.value, url.split("/")[5])
-                    yield loader.load_item()
-                else:
-                    # if current page does not contain location and the date info, follow
-                    # the story url to get this info.
-                    # Filter on duplicate entries
-                    yield response.follow(
-                        url=url,
-                        callback=self.parse_story,
-                        meta={"loader": loader},
-                        dont_filter=False,
+                # The location of the stories of the cities is known from the url, follow
+                # the story url only if the location or the date is not known.
+                outputs.append(
+                    self.complete_or_follow(
+                        response=response, story=stub, callback=self.parse_story
                     )
+                )
+        return outputs, known_stories
+
+    def extract_stories(self, response: TextResponse) -> list[dict]:
+        """
+        Extracts the stories of a listing page with the first extraction method which finds
+        any: the embedded JSON-LD, the embedded `__NEXT_DATA__` JSON or the HTML.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: list of dicts of the url, title, description and date of the stories
+        """
+        extractors: tuple[Callable[[TextResponse], list[dict]], ...] = (
+            self.extract_json_ld,
+            self.extract_next_data,
+            self.extract_html,
+        )
+        for extractor in extractors:
+            stories = extractor(response)
+            if stories:
+                name = extractor.__name__
+                self.extracted[name] = self.extracted.get(name, 0) + 1
+                self.logger.debug("Extracted %s stories with %s", len(stories), name)
+                return stories
+        return []
 
-    def parse_story(self, response: TextResponse) -> Iterable[NewsScrapperItem]:
+    def extract_json_ld(self, response: TextResponse) -> list[dict]:
+        """
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: the stories listed in the JSON-LD scripts, e.g. an `ItemList` of `NewsArticle`
+        """
+        data = []
+        for script in response.xpath("//script[@type='application/ld+json']/text()").getall():
+            try:
+                data.append(json.loads(script))
+            except ValueError:
+                self.logger.debug("Skipping invalid JSON-LD on %s", response.url)
+        return list(self.find_stories(response=response, data=data))
+
+    def extract_next_data(self, response: TextResponse) -> list[dict]:
+        """
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: the stories in the `__NEXT_DATA__` JSON of a Next.js rendered page
+        """
+        script = response.xpath("//script[@id='__NEXT_DATA__']/text()").get()
+        if not script:
+            return []
+        try:
+            data = json.loads(script)
+        except ValueError:
+            self.logger.debug("Skipping invalid __NEXT_DATA__ on %s", response.url)
+            return []
+        return list(self.find_stories(response=response, data=data))
+
+    def extract_html(self, response: TextResponse) -> list[dict]:
+        """
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: the stories of the server rendered (or Splash rendered) listing HTML
+        """
+        # once load more is done, response is received and parsed in order to get title, url,
+        # description, location and the date of the story using xpath selectors.
+        return [
+            {
+                "url": story.xpath("./div/h3/a/@href").get(),
+                "title": "".join(story.xpath("./div/h3/a/text()").getall()) or None,
+                "date": story.xpath("./div/p/text()").get(),
+                "description": "".join(story.xpath("./div/p[2]/text()").getall()) or None,
+            }
+            for story in response.xpath("//div[@class='details']")
+        ]
+
+    def find_stories(self, response: TextResponse, data: Any) -> Iterator[dict]:
+        """
+        Walks embedded JSON in document order and finds the objects linking to a story,
+        whatever the nesting, e.g. `ItemList.itemListElement[].item` in JSON-LD or
+        `props.pageProps...` in `__NEXT_DATA__`.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :param data: JSON decoded data
+        :return: iterator of dicts of the url, title, description and date of the stories
+        """
+        found = set()
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(reversed(node))
+                continue
+            if not isinstance(node, dict):
+                continue
+            url = node.get("url") or node.get("link") or node.get("permalink")
+            title = node.get("headline") or node.get("title") or node.get("name")
+            if isinstance(url, str) and isinstance(title, str) and self.STORY_URL_PATTERN in url:
+                url = response.urljoin(url)
+                if url not in found:
+                    found.add(url)
+                    date = node.get("datePublished") or node.get("date")
+                    description = node.get("description") or node.get("excerpt")
+                    yield {
+                        "url": url,
+                        "title": title,
+                        "date": date if isinstance(date, str) else None,
+                        "description": description if isinstance(description, str) else None,
+                    }
+                continue
+            stack.extend(reversed(list(node.values())))
+
+    def parse_feed(self, response: TextResponse) -> Iterable[Union[NewsScrapperItem, Request]]:
+        """
+        Parses the RSS feed of the listing, which needs neither rendering nor pagination.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: Iterable of `NewsScrapperItem` object or Iterable of `scrapy.http.Request` object
+        """
+        response.selector.remove_namespaces()
+        stories = []
+        for entry in response.xpath("//item"):
+            published = entry.xpath("./pubDate/text()").get()
+            try:
+                # RFC 822 dates, e.g. "Sun, 05 Jan 2025 10:30:00 +0530"
+                date = parsedate_to_datetime(published).isoformat() if published else None
+            except (TypeError, ValueError):
+                date = None
+            description = entry.xpath("./description/text()").get()
+            stories.append(
+                {
+                    "url": (entry.xpath("./link/text()").get() or "").strip(),
+                    "title": entry.xpath("./title/text()").get(),
+                    "date": date,
+                    "description": remove_tags(description) if description else None,
+                }
+            )
+        self.logger.info(f"Read {len(stories)} stories from the RSS feed")
+        outputs, _ = self.build_outputs(response=response, stories=stories)
+        yield from outputs
+
+    def parse_story(self, response: TextResponse, story: StoryStub) -> Iterable[NewsScrapperItem]:
         """
         Extracts required details from a specific story using xpath
-        selectors. A consecutive item object is updated with new required information.
+        selectors. The story known from the listing is completed with new required information.
 
         :param response: An instance of `scrapy.http.TextResponse`
+        :param story: `StoryStub` of the story, as filled from the listing
         :return: Iterable of `NewsScrapperItem` object
         """
         IndianExpressParser.CLICKS += 1
-        loader = response.meta["loader"]
-        location = (
+        missing = self.missing_fields(story)
+        if ItemField.LOCATION.value in missing:
+            story.location = self.extract_location(response=response)
+        if ItemField.DATE.value in missing:
+            story.date = self.extract_article(response=response)["date"]
+        yield story.loader().load_item()
+
+    def extract_location(self, response: TextResponse) -> Optional[str]:
+        """
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: the city of the url of a city story, else the location in the dateline
+        """
+        city = self.location_from_url(response.url)
+        if city:
+            return city
+        return (
             response.xpath(
                 "normalize-space(.//span[@itemprop='dateModified']/preceding-sibling::text()[1])"
             )
@@ -187,5 +562,3 @@ class IndianExpressParser(NewsWebsiteParser):
             .strip(" ")
             or ""
         )
-        loader.add_value(ItemField.LOCATION.value, location)
-        yield loader.load_item()
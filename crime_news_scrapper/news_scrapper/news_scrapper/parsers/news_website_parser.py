@@ -3,10 +3,16 @@ This module defines base implementation for any parser that will parse
 different crime websites.
 """
 
+import json
 import logging
-from typing import Optional
+import re
+from typing import Any, Iterable, Iterator, Optional, Union
 
-from scrapy.http import TextResponse
+from scrapy.http import Request, TextResponse
+from scrapy.loader import ItemLoader
+
+from ..const import ItemField, RequestType
+from ..items import NewsScrapperItem, StoryStub
 from ..log import set_up_logging
 
 
@@ -15,6 +21,18 @@ class NewsWebsiteParser:
     Module represents the base design template for any parsers.
     """
 
+    CLICKS = 0
+    LOAD_MORE_CLICKS = 0
+    # JSON-LD types of a story page
+    ARTICLE_TYPES = ("NewsArticle", "ReportageNewsArticle", "Article")
+    # Fields which a listing may lack, the story page is fetched only for the missing ones
+    REQUIRED_FIELDS = (ItemField.DATE.value, ItemField.LOCATION.value)
+    # Pattern of the story URLs which encode the city of a story, e.g. "/cities/<city>/"
+    CITY_URL_PATTERN: Optional[re.Pattern] = None
+    # Byte patterns of the nodes of a story page which `parse_story` needs, the download of
+    # the page is stopped once all of them are received (see `partial_download`)
+    STORY_PAGE_PATTERNS: tuple[bytes, ...] = ()
+
     def __init__(
         self,
         logger: Optional[logging.getLogger] = None,
@@ -28,13 +46,252 @@ class NewsWebsiteParser:
         :param file_name: file path to log
         """
         self.source = ""
+        # :py:class:`SeenUrlIndex` of already stored story URLs, set by the spider
+        self.seen_index = None
+        # In incremental mode pagination stops at the first page with only known stories
+        self.incremental = False
+        self.watermark_size = 20
+        # Number of stories emitted from the listings, without fetching their story pages
+        self.complete_listings = 0
+        # Pagination cursors by source, the persisted state of the spider when the crawl is
+        # run with a JOBDIR, so that a resumed crawl continues paginating where it stopped
+        self.cursors = {}
+        # Cursor to resume the pagination from, set by the spider only when the requests of
+        # the interrupted crawl were not resumed along with it
+        self.resume_from = None
+        # Shard of a sharded crawl, which loads every `shard_count`th listing page only,
+        # starting from its `shard_index`th page (see `news_scrapper.shards`)
+        self.shard_index = 0
+        self.shard_count = 1
         self.logger = logger or logging.getLogger(name=self.__class__.__name__)
         if logger is None:
             set_up_logging(logger=self.logger, log_level=log_level, file_name=file_name)
 
+    def is_known(self, url: str) -> bool:
+        """
+        Checks whether a story URL is already stored, in which case the story
+        need not be downloaded again.
+        :param url: story URL
+        :return: True if the story is already stored else False
+        """
+        return self.seen_index is not None and url in self.seen_index
+
+    def watermark(self) -> list[str]:
+        """
+        Returns the newest stored story URLs of this source. An incremental crawl
+        can stop paginating once it reaches any of those.
+        :return: list of story URLs, empty if not crawling incrementally
+        """
+        if not self.incremental or self.seen_index is None:
+            return []
+        return self.seen_index.newest(source=self.source, limit=self.watermark_size)
+
+    def reached_known_stories(self, new_stories: int, known_stories: int) -> bool:
+        """
+        Checks whether an incremental crawl should stop paginating, that is when a
+        page holds only the stories which are already stored.
+        :param new_stories: number of not yet stored stories on a page
+        :param known_stories: number of already stored stories on a page
+        :return: True if the pagination should stop else False
+        """
+        return self.incremental and known_stories > 0 and new_stories == 0
+
+    def save_cursor(self, **cursor: Any) -> None:
+        """
+        Remembers the next listing page to load, once it is requested.
+        :param cursor: plain values to request the next page with, e.g. its number and url
+        """
+        self.cursors[self.source] = cursor
+
+    def clear_cursor(self) -> None:
+        """
+        Forgets the pagination cursor once the last listing page to load was reached.
+        """
+        self.cursors.pop(self.source, None)
+
+    def resume_cursor(self) -> Optional[dict[str, Any]]:
+        """
+        :return: the next listing page to load, as saved by an interrupted crawl whose
+            requests were not resumed, else None. It is returned only once.
+        """
+        cursor, self.resume_from = self.resume_from, None
+        if cursor:
+            self.logger.info(f"Resuming the pagination of {self.source} at page {cursor['page']}")
+        return cursor
+
+    def request_dropped(self, request: Request) -> None:
+        """
+        Called when the scheduler drops a request of this parser, e.g. a duplicate request.
+        :param request: the dropped `scrapy.Request` object
+        """
+
+    def can_shard_pages(self) -> bool:
+        """
+        :return: True if the listing pages can be loaded by the shards of a crawl, each shard
+            its own pages, else the site is crawled by a single shard
+        """
+        return False
+
+    def owns_front_page(self) -> bool:
+        """
+        :return: True if the stories of the front page (and of the feed) are parsed by this
+            shard, i.e. the first one
+        """
+        return self.shard_index == 0
+
+    def first_shard_page(self, first_page: int) -> int:
+        """
+        :param first_page: number of the first listing page of the site
+        :return: number of the first listing page loaded by this shard
+        """
+        return first_page + self.shard_index
+
+    def next_shard_page(self, page: int, pages_ahead: int = 1) -> int:
+        """
+        :param page: number of a listing page loaded by this shard
+        :param pages_ahead: number of the pages of this shard to move ahead by
+        :return: number of the next (or the `pages_ahead`th next) listing page loaded by
+            this shard
+        """
+        return page + self.shard_count * pages_ahead
+
     def parse_front_page(self, response: TextResponse):
         """
         Abstract method to parse front page of any crime website
         :param response: An instance of `scrapy.http.response.TextResponse`
         """
         raise NotImplementedError()
+
+    def location_from_url(self, url: Optional[str]) -> Optional[str]:
+        """
+        :param url: story URL
+        :return: the city encoded in the URL, e.g. "pune" of ".../cities/pune/...", else None
+        """
+        if url and self.CITY_URL_PATTERN is not None:
+            match = self.CITY_URL_PATTERN.search(url)
+            if match:
+                return match.group(1)
+        return None
+
+    def missing_fields(self, story: StoryStub) -> list[str]:
+        """
+        :param story: `StoryStub` of a story, as filled from a listing
+        :return: the names of the required fields which are not known yet
+        """
+        return story.missing(self.REQUIRED_FIELDS)
+
+    def complete_or_follow(
+        self, response: TextResponse, story: StoryStub, callback: Any
+    ) -> Union[NewsScrapperItem, Request]:
+        """
+        Emits a story straight from its listing data when all the required fields are known,
+        taking the location from the URL if needed, else requests the story page for the
+        missing fields. The story is passed to the callback as its `story` keyword argument.
+        :param response: An instance of `scrapy.http.TextResponse` of the listing
+        :param story: `StoryStub` of the story, as filled from the listing
+        :param callback: callback for the story page, which completes the item
+        :return: `NewsScrapperItem` object or `scrapy.http.Request` object for the story page
+        """
+        if not (story.location or "").strip():
+            story.location = self.location_from_url(story.url)
+        missing = self.missing_fields(story)
+        if not missing:
+            self.complete_listings += 1
+            return story.loader().load_item()
+        self.logger.debug("Fetching the story page for %s: %s", ", ".join(missing), story.url)
+        # Filter on duplicate entries
+        return response.follow(
+            url=story.url,
+            callback=callback,
+            cb_kwargs={"story": story},
+            meta={
+                "request_type": RequestType.STORY.value,
+                "stop_download_after": self.STORY_PAGE_PATTERNS,
+            },
+            dont_filter=False,
+        )
+
+    def article_page_patterns(self) -> tuple[bytes, ...]:
+        """
+        :return: byte patterns of the nodes of a story page which `parse_article` needs,
+            i.e. the metadata in the head along with the nodes `parse_story` needs
+        """
+        if not self.STORY_PAGE_PATTERNS:
+            return ()
+        return (rb"</head>",) + self.STORY_PAGE_PATTERNS
+
+    def extract_location(self, response: TextResponse) -> Optional[str]:
+        """
+        Extracts the location of a story from its page.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: the location or None if not known
+        """
+        return self.location_from_url(response.url)
+
+    def extract_article(self, response: TextResponse) -> dict:
+        """
+        Extracts the title, description and date of a story from the metadata of its page,
+        i.e. its JSON-LD article, else its Open Graph tags.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: dict of the url, title, description and date of the story
+        """
+        article = {}
+        for script in response.xpath("//script[@type='application/ld+json']/text()").getall():
+            try:
+                article = next(self.find_articles(json.loads(script)), {})
+            except ValueError:
+                self.logger.debug("Skipping invalid JSON-LD on %s", response.url)
+            if article:
+                break
+        url = article.get("url") or response.xpath("//link[@rel='canonical']/@href").get()
+        return {
+            "url": response.urljoin(url) if isinstance(url, str) else response.url,
+            "title": article.get("headline")
+            or response.xpath("//meta[@property='og:title']/@content").get(),
+            "description": article.get("description")
+            or response.xpath("//meta[@property='og:description']/@content").get(),
+            "date": article.get("datePublished")
+            or response.xpath("//meta[@property='article:published_time']/@content").get(),
+        }
+
+    def find_articles(self, data: Any) -> Iterator[dict]:
+        """
+        :param data: JSON decoded JSON-LD, a single object, a list or a `@graph`
+        :return: iterator of the article objects
+        """
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(reversed(node))
+            elif isinstance(node, dict):
+                types = node.get("@type")
+                types = types if isinstance(types, list) else [types]
+                if any(article_type in types for article_type in self.ARTICLE_TYPES):
+                    yield node
+                elif isinstance(node.get("@graph"), list):
+                    stack.extend(reversed(node["@graph"]))
+
+    def parse_article(self, response: TextResponse) -> Iterable[NewsScrapperItem]:
+        """
+        Parses a story page found without any listing, e.g. in a sitemap or a feed, so all
+        the details of the story are extracted from the page itself.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: Iterable of `NewsScrapperItem` object
+        """
+        type(self).CLICKS += 1
+        article = self.extract_article(response=response)
+        if not article["title"]:
+            self.logger.warning("No story found on %s", response.url)
+            return
+        if article["url"] != response.url and self.is_known(article["url"]):
+            self.logger.debug("This story is already stored, hence skipping: %s", article["url"])
+            return
+        loader = ItemLoader(item=NewsScrapperItem())
+        loader.add_value(ItemField.SOURCE.value, self.source)
+        loader.add_value(ItemField.TITLE.value, article["title"])
+        loader.add_value(ItemField.URL.value, article["url"])
+        loader.add_value(ItemField.DESCRIPTION.value, article["description"])
+        loader.add_value(ItemField.DATE.value, article["date"])
+        loader.add_value(ItemField.LOCATION.value, self.extract_location(response=response))
+        yield loader.load_item()
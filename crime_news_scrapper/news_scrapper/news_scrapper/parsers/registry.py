@@ -0,0 +1,111 @@
+"""
+This module provides a registry of the parsers for the different crime websites. Each parser
+class is resolved only once and a single parser instance is shared for a site.
+
+Apart from the built-in parsers listed in :py:class:`ParserType` and :py:class:`ClassMapping`,
+parsers can be registered by any installed package through the `news_scrapper.parsers`
+entry point group, where the entry point name is the site name, e.g.::
+
+    [project.entry-points."news_scrapper.parsers"]
+    thehindu = "hindu_parser.parser:TheHinduParser"
+
+How To Use This Module
+======================
+
+For example:
+1. Import class :py:class:`ParserRegistry`:
+   ``from news_scrapper.parsers.registry import ParserRegistry``.
+
+2. Initialize class:
+   registry = ParserRegistry()
+
+3. Get the parser for a site:
+   india_today = registry.get(site="indiatoday")
+"""
+
+import importlib
+from importlib.metadata import entry_points
+import logging
+from typing import Any, Optional
+
+from ..const import ClassMapping, ParserType
+from .news_website_parser import NewsWebsiteParser
+
+
+class ParserRegistry:
+    """
+    Initializes a :py:class:`ParserRegistry` object.
+    Maps the site names to the parser classes and caches one parser instance per site.
+
+    ::return: a new :py:class:`ParserRegistry` object
+    """
+
+    ENTRY_POINT_GROUP = "news_scrapper.parsers"
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        """
+        :param logger: `logging.Logger` object
+        """
+        self.log = logger or logging.getLogger()
+        # site name -> class path ("module.Class") or entry point, resolved lazily
+        self.classes = {}
+        self.instances = {}
+        for parser_type in ParserType:
+            self.classes[parser_type.name.lower()] = ClassMapping[parser_type.value].value
+        for entry_point in entry_points(group=self.ENTRY_POINT_GROUP):
+            self.log.info(
+                "Found the parser entry point %s: %s", entry_point.name, entry_point.value
+            )
+            self.classes[entry_point.name.lower()] = entry_point
+
+    def register(self, site: str, cls: type) -> None:
+        """
+        Registers a parser class for a site, replacing any already registered one.
+        :param site: site name, as used in `sites_to_crawl`
+        :param cls: parser class, derived from :py:class:`NewsWebsiteParser`
+        """
+        self.classes[site.lower()] = cls
+        self.instances.pop(site.lower(), None)
+
+    def sites(self) -> list[str]:
+        """
+        :return: names of all the sites with a registered parser
+        """
+        return list(self.classes)
+
+    def get(self, site: str) -> NewsWebsiteParser:
+        """
+        Returns the parser instance for a site, the parser is created on the first call only.
+        :param site: site name, as used in `sites_to_crawl`
+        :return: parser instance
+        """
+        site = site.lower()
+        if site not in self.instances:
+            self.log.info("Initializing the parser for %s:", site)
+            cls = self.resolve(site=site)
+            try:
+                self.instances[site] = cls()
+            except Exception as err:
+                raise Exception(f"Instantiation failed for a parser: {site}: {err}") from err
+        return self.instances[site]
+
+    def resolve(self, site: str) -> Any:
+        """
+        Imports the parser class registered for a site.
+        :param site: site name, as used in `sites_to_crawl`
+        :return: parser class
+        """
+        if site not in self.classes:
+            raise ValueError(f"No parser registered for a site: {site}")
+        cls = self.classes[site]
+        try:
+            if isinstance(cls, str):
+                module_path, class_name = cls.rsplit(".", 1)
+                self.log.info("Importing the module %s:", class_name)
+                cls = getattr(importlib.import_module(module_path), class_name)
+            elif not isinstance(cls, type):
+                cls = cls.load()
+        except ImportError as i_err:
+            raise ImportError(f"Unable to import module for {site}: {i_err}") from i_err
+        self.classes[site] = cls
+        return cls
@@ -0,0 +1,171 @@
+"""
+This module provides a downloader middleware which stops the download of a story page as soon
+as the metadata needed from it has been received, e.g. the date and the location near the top
+of the article, instead of downloading the whole page with all its body and scripts.
+
+A request opts in with the `stop_download_after` meta key, a tuple of byte patterns which
+match the needed nodes, e.g. ``rb'class="strydate">.*?</span>'``. The body is decompressed
+while being received and once all the patterns have matched the download is stopped with
+:py:class:`scrapy.exceptions.StopDownload`, the callback then gets the partial response,
+flagged with "download_stopped". A page on which any pattern never matches is downloaded
+whole, as are all the pages when the HTTP cache is enabled.
+
+How To Use This Module
+======================
+
+Enable the middleware in the scrapy settings::
+
+    DOWNLOADER_MIDDLEWARES = {"news_scrapper.partial_download.PartialDownloadMiddleware": 710}
+
+and set the patterns of a request::
+
+    Request(url=url, meta={"stop_download_after": (rb"</head>",)})
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+import re
+from typing import Optional
+import zlib
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured, StopDownload
+from scrapy.http import Headers
+
+from config import get_config
+
+META_KEY = "stop_download_after"
+# Only these content encodings can be decompressed while being received
+DECODER_WBITS = {b"gzip": 16 + zlib.MAX_WBITS, b"x-gzip": 16 + zlib.MAX_WBITS, b"deflate": 47}
+
+
+@lru_cache(maxsize=64)
+def compile_patterns(patterns: tuple[bytes, ...]) -> tuple[re.Pattern, ...]:
+    """
+    :param patterns: byte patterns of a request
+    :return: the compiled patterns, `.` matching the line breaks as well
+    """
+    return tuple(re.compile(pattern, re.DOTALL) for pattern in patterns)
+
+
+@dataclass
+class PartialDownload:
+    """Body of a story page received so far and the patterns not matched yet"""
+
+    pending: list[re.Pattern]
+    decoder: Optional["zlib._Decompress"]
+    expected_size: int
+    body: bytearray = field(default_factory=bytearray)
+    received: int = 0
+
+
+class PartialDownloadMiddleware:
+    """
+    Initializes a :py:class:`PartialDownloadMiddleware` object.
+    Downloader middleware stopping the download of a response once the patterns in the
+    `stop_download_after` meta of its request have been received.
+
+    ::return: a new :py:class:`PartialDownloadMiddleware` object
+    """
+
+    # A page whose patterns are not found within this many (decompressed) bytes is
+    # downloaded whole without searching it any further
+    MAX_SEARCHED_SIZE = 1024 * 1024
+
+    def __init__(self, crawler: Crawler):
+        """
+        :param crawler: `scrapy.crawler.Crawler` object
+        """
+        self.stats = crawler.stats
+        self.downloads: dict[Request, PartialDownload] = {}
+        crawler.signals.connect(self.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(self.bytes_received, signal=signals.bytes_received)
+        crawler.signals.connect(self.request_left, signal=signals.request_left_downloader)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "PartialDownloadMiddleware":
+        # The HTTP cache must hold the whole pages
+        if not get_config().spider.partial_story_download or crawler.settings.getbool(
+            "HTTPCACHE_ENABLED"
+        ):
+            raise NotConfigured
+        return cls(crawler)
+
+    def process_request(self, request: Request, spider: Spider) -> None:
+        """
+        Asks only for the content encodings which can be decompressed while being received.
+        :param request: `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        if request.meta.get(META_KEY):
+            request.headers[b"Accept-Encoding"] = b"gzip, deflate"
+        return None
+
+    def headers_received(
+        self, headers: Headers, body_length: int, request: Request, spider: Spider
+    ) -> None:
+        """
+        Starts tracking the body of a response whose request has patterns.
+        :param headers: response headers
+        :param body_length: expected size of the body, -1 if not known
+        :param request: `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        patterns = request.meta.get(META_KEY)
+        if not patterns:
+            return
+        encoding = (headers.get(b"Content-Encoding") or b"").lower()
+        if encoding in (b"", b"identity"):
+            decoder = None
+        elif encoding in DECODER_WBITS:
+            decoder = zlib.decompressobj(DECODER_WBITS[encoding])
+        else:
+            return
+        self.downloads[request] = PartialDownload(
+            pending=list(compile_patterns(tuple(patterns))),
+            decoder=decoder,
+            expected_size=body_length,
+        )
+
+    def bytes_received(self, data: bytes, request: Request, spider: Spider) -> None:
+        """
+        Searches the body received so far for the pending patterns of a request and stops
+        the download once all of them have matched.
+        :param data: chunk of the body, as received
+        :param request: `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        download = self.downloads.get(request)
+        if download is None:
+            return
+        download.received += len(data)
+        try:
+            download.body += download.decoder.decompress(data) if download.decoder else data
+        except zlib.error:
+            del self.downloads[request]
+            return
+        download.pending = [
+            pattern for pattern in download.pending if not pattern.search(download.body)
+        ]
+        if download.pending:
+            if len(download.body) > self.MAX_SEARCHED_SIZE:
+                del self.downloads[request]
+            return
+        del self.downloads[request]
+        self.stats.inc_value("partial_download/stopped", spider=spider)
+        if download.expected_size > 0:
+            self.stats.inc_value(
+                "partial_download/bytes_saved",
+                download.expected_size - download.received,
+                spider=spider,
+            )
+        raise StopDownload(fail=False)
+
+    def request_left(self, request: Request, spider: Spider) -> None:
+        """
+        Forgets the body of a request which left the downloader, e.g. on an error.
+        :param request: `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        self.downloads.pop(request, None)
@@ -11,13 +11,18 @@ stores it in a database.
 
 # useful for handling different item types with a single interface
 import logging
-import sys
+import time
+from typing import Iterator, Optional, Union
 from itemadapter import ItemAdapter
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.internet.task import LoopingCall
 
-from config import get_config_path, load_config
-from news_scrapper.database.postgresql import PostgreSQLDB
+from config import get_config
+from news_scrapper.database.database import WriteResult, get_database_class
+from news_scrapper.database.writer import AsyncDBWriter
 from news_scrapper.log import set_up_logging
 from news_scrapper.items import NewsScrapperItem
+from news_scrapper.near_duplicates import NearDuplicateIndex, simhash
 
 
 class NewsScrapperStoragePipeline:
@@ -28,45 +33,252 @@ class NewsScrapperStoragePipeline:
 
     def __init__(self):
         self.db = None
-        self.log = logging.getLogger()
+        self.writer = None
+        self.flush_loop = None
+        self.log = logging.getLogger(name="news_scrapper.pipeline")
+        self.batch = []
+        self.batch_size = 1
+        self.flush_interval = 0
+        self.batch_started = None
+        self.stats = None
+        self.seen_index = None
+        self.near_duplicates = None
+        self.totals = WriteResult()
 
     def open_spider(self, spider):
         """
         This method is called when the spider is opened. It reads the
         database config and establishes a connection with a database
         """
-        config_path = get_config_path()
-        config = load_config(config_path=config_path)
-        db_config = config.get("database", {})
-        pipeline_config = config.get("pipeline", {})
-        for config_key, config_val in db_config.items():
-            globals()[config_key] = config_val
-        log_level = pipeline_config.get("log_level", "INFO")
-        log_path = pipeline_config.get("file_name", "pipeline.log")
-        set_up_logging(logger=self.log, log_level=log_level, file_name=log_path)
-        self.log.info("Initializing the database client")
-        self.db = PostgreSQLDB(
-            db_name=db_name, username=username, host=host, port=port, table=table_name
+        config = get_config()
+        db_config = config.database
+        pipeline_config = config.pipeline
+        set_up_logging(
+            logger=self.log,
+            log_level=pipeline_config.log_level,
+            file_name=pipeline_config.file_name,
         )
+        # Items are buffered and written with one multi-row insert once the batch
+        # reaches `batch_size` items or is older than `flush_interval` seconds.
+        self.batch_size = pipeline_config.batch_size
+        self.flush_interval = pipeline_config.flush_interval
+        self.log.info("Initializing the %s database client", db_config.backend)
+        self.stats = spider.crawler.stats
+        self.db = get_database_class(backend=db_config.backend).from_config(db_config)
+        self.seen_index = getattr(spider, "seen_index", None)
+        if self.seen_index is not None and config.seen_index.preload_from_database:
+            added = self.seen_index.add_many(self.db.iter_urls())
+            self.log.info("Seeded the seen URL index with %s stored URLs", added)
+        if config.near_duplicates.enabled:
+            self.near_duplicates = NearDuplicateIndex(
+                max_distance=config.near_duplicates.max_distance,
+                cross_source_only=config.near_duplicates.cross_source_only,
+                logger=self.log,
+            )
+            added = self.near_duplicates.add_many(self.stored_fingerprints())
+            self.log.info("Seeded the near-duplicate index with %s stored stories", added)
+        if pipeline_config.write_mode == "async":
+            # Batches are written on a writer thread, the reactor thread only waits
+            # when `max_pending_batches` batches are already queued.
+            self.writer = AsyncDBWriter(
+                db=self.db,
+                max_pending=pipeline_config.max_pending_batches,
+                threads=pipeline_config.writer_threads,
+                logger=self.log,
+                on_failed=self.report_failure,
+            )
+            self.writer.start()
+        if self.flush_interval > 0:
+            self.flush_loop = LoopingCall(self.flush_stale)
+            self.flush_loop.start(self.flush_interval, now=False)
 
-    def process_item(self, item, spider) -> NewsScrapperItem:
+    def process_item(self, item, spider) -> Union[NewsScrapperItem, Deferred]:
         """
         Processes an item received from Item loader to further
         add it into the database table.
         :param item: a scraped `scrapy.Item` object
         :param spider: spider (`Spider` object) the spider which was opened
-        ::return: `NewsScrapperItem` object
+        ::return: `NewsScrapperItem` object or a `Deferred` firing with it
         """
+        self.log.debug("Processing an item to store it into the database table")
+        self.fingerprint(item=item)
+        if not self.batch:
+            self.batch_started = time.monotonic()
+        self.batch.append(item)
+        if len(self.batch) >= self.batch_size:
+            accepted = self.flush()
+            if accepted is not None:
+                return accepted.addCallback(lambda _: item)
+        return item
+
+    def stored_fingerprints(self) -> Iterator[tuple[int, str, str]]:
+        """
+        Iterates over the fingerprints of the stored stories, computing the missing ones.
+        :return: iterator of (fingerprint, url, source) tuples
+        """
+        for url, source, fingerprint, title, description in self.db.iter_fingerprints():
+            if fingerprint is None:
+                fingerprint = simhash(title, description)
+            yield fingerprint, url, source
+
+    def fingerprint(self, item) -> None:
+        """
+        Sets the SimHash fingerprint of an item. If a near-duplicate of the item is
+        already stored, or buffered in the same batch, the item is linked to it instead
+        of being stored.
+        :param item: a scraped `scrapy.Item` object
+        """
+        adapter = ItemAdapter(item)
+        fingerprint = simhash(adapter.get("title"), adapter.get("description"))
+        adapter["simhash"] = fingerprint
+        if self.near_duplicates is None:
+            return
+        url, source = adapter.get("url"), adapter.get("source")
+        match = self.near_duplicates.find(fingerprint=fingerprint, url=url, source=source)
+        if match is None:
+            # The buffered rows are only added to the index once they are written, and are
+            # written along with the rows linked to them
+            match = self.find_in_batch(fingerprint=fingerprint, url=url, source=source)
+        if match is None:
+            return
+        adapter["duplicate_of"], adapter["distance"] = match
+        self.log.info("%s is a near-duplicate of %s (distance %s)", url, *match)
+        self.stats.inc_value("pipeline/near_duplicates")
+
+    def find_in_batch(
+        self, fingerprint: int, url: Optional[str], source: Optional[str]
+    ) -> Optional[tuple[str, int]]:
+        """
+        Finds the closest near-duplicate of a story among the rows of the current batch.
+        The rows of the earlier batches still being written are not matched, as a story
+        linked to one of them would point to a row never stored if that write failed.
+        :param fingerprint: unsigned 64 bit fingerprint of the story
+        :param url: url of the story
+        :param source: source of the story
+        :return: (url, distance) of the closest near-duplicate, None if there is none
+        """
+        if not fingerprint:
+            return None
+        matches = [
+            ((fingerprint ^ row.get("simhash")).bit_count(), row.get("url"))
+            for row in self.batch
+            if row.get("simhash")
+            and not row.get("duplicate_of")
+            and row.get("url") != url
+            and not (self.near_duplicates.cross_source_only and row.get("source") == source)
+        ]
+        distance, match_url = min(matches, default=(self.near_duplicates.max_distance + 1, None))
+        if distance > self.near_duplicates.max_distance:
+            return None
+        return match_url, distance
+
+    def index_written(self, rows: list) -> None:
+        """
+        Adds the fingerprints of the written rows to the near-duplicate index, the rows
+        of a failed write are never added, so that no story is linked to a row never stored.
+        :param rows: rows of a successful flush
+        """
+        if self.near_duplicates is None:
+            return
+        for row in rows:
+            if not row.get("duplicate_of"):
+                self.near_duplicates.add(
+                    fingerprint=row.get("simhash"), url=row.get("url"), source=row.get("source")
+                )
+
+    def flush_stale(self) -> Optional[Deferred]:
+        """
+        Called every `flush_interval` seconds, writes the buffered items
+        once the current batch is older than `flush_interval` seconds.
+        """
+        if self.batch and time.monotonic() - self.batch_started >= self.flush_interval:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[Deferred]:
+        """
+        Writes all the buffered items to the database table with a single
+        multi-row insert and reports the flush latency and throughput.
+        In async write mode the rows are handed over to the writer thread instead.
+        ::return: `Deferred` firing once the rows are queued in async write mode, else None
+        """
+        if not self.batch:
+            return None
+        rows, self.batch = self.batch, []
+        if self.writer is not None:
+            return self.writer.write(rows=rows, on_written=self.report_flush)
+        started = time.perf_counter()
         try:
-            self.log.info("Processing an item to store it into the database table")
-            self.db.add(params=item)
-            return item
+            result = self.db.add_many(rows=rows)
         except Exception as err:
-            sys.exit()
+            self.log.error("Writing a batch of %s rows failed: %s", len(rows), err)
+            self.report_failure(rows=rows)
+            return None
+        self.report_flush(rows=rows, result=result, elapsed=time.perf_counter() - started)
+        return None
+
+    def report_flush(self, rows: list, result: WriteResult, elapsed: float) -> None:
+        """
+        Logs the latency, the throughput and the affected rows of a single flush.
+        :param rows: rows written by the flush
+        :param result: `WriteResult` object returned by the flush
+        :param elapsed: flush latency in seconds
+        """
+        self.log.info(
+            "Flushed %s rows in %.3f seconds (%.1f rows/sec): "
+            "%s inserted, %s updated, %s skipped, %s failed, %s linked",
+            len(rows),
+            elapsed,
+            len(rows) / elapsed if elapsed else float("inf"),
+            result.inserted,
+            result.updated,
+            result.skipped,
+            result.failed,
+            result.linked,
+        )
+        self.record(result=result)
+        self.index_written(rows=rows)
+        if self.seen_index is not None:
+            # Only the written rows are marked as seen, the rows of a failed
+            # flush are downloaded again by the next crawl.
+            self.seen_index.add_many((row.get("url"), row.get("source")) for row in rows)
 
-    def close_spider(self, spider):
+    def report_failure(self, rows: list) -> None:
+        """
+        Counts the rows of a failed flush, the crawl goes on with the next batch.
+        :param rows: rows of the failed flush
+        """
+        self.record(result=WriteResult(failed=len(rows)))
+
+    def record(self, result: WriteResult) -> None:
+        """
+        Adds the counts of a flush to the totals and the crawl stats.
+        :param result: `WriteResult` object of a flush
+        """
+        self.totals += result
+        for key, value in vars(result).items():
+            self.stats.inc_value(f"pipeline/rows_{key}", value)
+
+    def close_spider(self, spider) -> Optional[Deferred]:
         """This method is called when the spider is closed.
         :param spider: spider (`Spider` object) the spider which was closed
         """
+        if self.flush_loop is not None and self.flush_loop.running:
+            self.flush_loop.stop()
+        self.log.info("Flushing the remaining %s buffered items", len(self.batch))
+        if self.writer is not None:
+            closed = maybeDeferred(self.flush)
+            closed.addBoth(lambda _: self.writer.close())
+            closed.addBoth(lambda _: self.close_db())
+            return closed
+        try:
+            self.flush()
+        finally:
+            self.close_db()
+        return None
+
+    def close_db(self) -> None:
+        """Closes the database connection"""
+        self.log.info("Total rows written: %s", self.totals)
         self.log.info("Closing the database connection")
         self.db.close()
@@ -0,0 +1,132 @@
+"""
+This module provides a persistent index of the story URLs which are already stored, so that
+the parsers can skip downloading those stories again in the subsequent crawls.
+
+How To Use This Module
+======================
+
+For example:
+1. Import class :py:class:`SeenUrlIndex`:
+   ``from news_scrapper.seen_index import SeenUrlIndex``.
+
+2. Initialize and open the index:
+   seen_index = SeenUrlIndex(path="seen_urls.sqlite3")
+   seen_index.open()
+
+3. Mark the URLs as seen and look them up:
+   seen_index.add_many([(url, source)])
+   url in seen_index
+
+4. Get the newest seen URLs of a source:
+   seen_index.newest(source=source, limit=20)
+
+5. Share the index among the processes of a sharded crawl, the URLs added by the other
+   processes are looked up in the sqlite file:
+   seen_index = SeenUrlIndex(path="seen_urls.sqlite3", shared=True)
+"""
+
+import logging
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+
+class SeenUrlIndex:
+    """
+    Initializes a :py:class:`SeenUrlIndex` object.
+    Keeps the seen URLs in a sqlite file which survives across crawls, along with an
+    in-memory set of the same URLs for fast lookups on the reactor thread.
+
+    ::return: a new :py:class:`SeenUrlIndex` object
+    """
+
+    # Seconds to wait for the other processes sharing the sqlite file to finish writing
+    SHARED_TIMEOUT = 30
+
+    def __init__(self, path: str, logger: Optional[logging.Logger] = None, shared: bool = False):
+        """
+        :param path: path of the sqlite file to store the URLs in.
+        :param logger: `logging.Logger` object
+        :param shared: whether other processes add URLs to the same file while crawling
+        """
+        self.path = path
+        self.shared = shared
+        self.log = logger or logging.getLogger()
+        self.connection = None
+        self.urls = set()
+
+    def open(self) -> None:
+        """Opens (or creates) the sqlite file and loads all the seen URLs into memory"""
+        self.log.info("Opening the seen URL index: %s", self.path)
+        self.connection = sqlite3.connect(self.path, timeout=self.SHARED_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seen_urls
+            (
+                url TEXT PRIMARY KEY,
+                source TEXT,
+                seen_at REAL
+            )
+            """
+        )
+        self.connection.commit()
+        self.urls = {url for (url,) in self.connection.execute("SELECT url FROM seen_urls")}
+        self.log.info("Loaded %s seen URLs", len(self.urls))
+
+    def __contains__(self, url: str) -> bool:
+        if url in self.urls:
+            return True
+        if not self.shared or self.connection is None:
+            return False
+        # The URL may have been added by another process since the index was opened
+        found = (
+            self.connection.execute("SELECT 1 FROM seen_urls WHERE url = ?", (url,)).fetchone()
+            is not None
+        )
+        if found:
+            self.urls.add(url)
+        return found
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def add_many(self, entries: Iterable[tuple[str, str]]) -> int:
+        """
+        Marks the given URLs as seen.
+        :param entries: iterable of (url, source) tuples
+        :return: number of URLs which were not seen before
+        """
+        now = time.time()
+        new_entries = []
+        for url, source in entries:
+            if url and url not in self.urls:
+                self.urls.add(url)
+                new_entries.append((url, source, now))
+        if new_entries:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO seen_urls (url, source, seen_at) VALUES (?, ?, ?)",
+                new_entries,
+            )
+            self.connection.commit()
+        return len(new_entries)
+
+    def newest(self, source: str, limit: int) -> list[str]:
+        """
+        Returns the most recently seen URLs of a source, which act as the watermark
+        for an incremental crawl.
+        :param source: source of the stories
+        :param limit: maximum number of URLs to return
+        :return: list of URLs, the newest one first
+        """
+        cursor = self.connection.execute(
+            "SELECT url FROM seen_urls WHERE source = ? ORDER BY rowid DESC LIMIT ?",
+            (source, limit),
+        )
+        return [url for (url,) in cursor]
+
+    def close(self) -> None:
+        """Closes the sqlite file"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
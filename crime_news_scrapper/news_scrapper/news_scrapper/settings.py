@@ -20,7 +20,8 @@ NEWSPIDER_MODULE = "news_scrapper.spiders"
 ROBOTSTXT_OBEY = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+# The download slots of the sites (`download_slots` in the config) are limited on their own
+CONCURRENT_REQUESTS = 32
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
@@ -56,9 +57,11 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+# AutoThrottle is replaced by the adaptive throttle, which tunes the concurrency as well
+EXTENSIONS = {
+    "scrapy.extensions.throttle.AutoThrottle": None,
+    "news_scrapper.throttle.AdaptiveThrottle": 0,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
@@ -68,11 +71,11 @@ ITEM_PIPELINES = {
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
+AUTOTHROTTLE_ENABLED = True
 # The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
+AUTOTHROTTLE_START_DELAY = 0.5
 # The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
+AUTOTHROTTLE_MAX_DELAY = 30
 # The average number of requests Scrapy should be sending in parallel to
 # each remote server
 #AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
@@ -101,6 +104,8 @@ RETRY_TIMES = 5
 # Scrapy-splash configuration
 SPLASH_URL = 'http://localhost:8050'
 DOWNLOADER_MIDDLEWARES = {
+    'news_scrapper.throttle.DownloadSlotMiddleware': 700,
+    'news_scrapper.partial_download.PartialDownloadMiddleware': 710,
     'scrapy_splash.SplashCookiesMiddleware': 723,
     'scrapy_splash.SplashMiddleware': 725,
     'scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware': 810,
@@ -111,5 +116,7 @@ SPIDER_MIDDLEWARES = {
     'scrapy_splash.SplashDeduplicateArgsMiddleware': 100,
 }
 DUPEFILTER_CLASS = 'scrapy_splash.SplashAwareDupeFilter'
-HTTPCACHE_STORAGE = 'scrapy_splash.SplashAwareFSCacheStorage'
+# The HTTP cache is enabled in the `http_cache` section of the config
+HTTPCACHE_STORAGE = 'news_scrapper.http_cache.SqliteCacheStorage'
+HTTPCACHE_POLICY = 'news_scrapper.http_cache.NewsCachePolicy'
 CUSTOM_CONFIG_PATH='/home/madhura/projects/pangolin/crime_news_scrapper/config.yaml'
@@ -0,0 +1,127 @@
+"""
+This module runs a crawl of the news spider in several processes, one per shard, so that
+the parsing of the pages is spread over the cores instead of sharing a single one.
+
+The listing pages of a site are split among the shards, shard `i` of `n` loads the pages
+`i + 1`, `i + 1 + n`, `i + 1 + 2n` and so on, and the first shard parses the front page
+and the feed of the site as well. A site whose listing pages cannot be split, e.g. a listing
+rendered by Splash, is crawled by a single shard. The shards share the seen URL index, so a
+story stored by one shard is not downloaded by the others, and store the stories through the
+storage pipeline of each process, the file backends writing a part file per process. The
+shards share the HTTP cache file too, if enabled.
+
+How To Use This Module
+======================
+
+Move to the scrapy project directory and start the crawl with a shard per core::
+
+    python -m news_scrapper.shards
+
+or with a given number of shards, passing the arguments after ``--`` to every
+``scrapy crawl``::
+
+    python -m news_scrapper.shards --shards 4 -- -s LOG_LEVEL=INFO
+
+A single Ctrl-C stops all the shards gracefully. With `job_dir` set in the `spider` section
+of the config, each shard keeps its state in its own `shard-<index>` subdirectory, so that
+running the same command again resumes all of them.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+from typing import Optional, Sequence
+
+from config import get_config
+from news_scrapper.log import set_up_logging
+
+SPIDER_NAME = "news_spider"
+
+
+def shard_commands(shard_count: int, job_dir: str, scrapy_args: Sequence[str]) -> list[list[str]]:
+    """
+    :param shard_count: number of the shards
+    :param job_dir: job directory of the crawl, empty if not resumable
+    :param scrapy_args: additional arguments of ``scrapy crawl``
+    :return: the ``scrapy crawl`` command of each shard
+    """
+    commands = []
+    for shard_index in range(shard_count):
+        command = [sys.executable, "-m", "scrapy", "crawl", SPIDER_NAME]
+        command += ["-a", f"shard_index={shard_index}", "-a", f"shard_count={shard_count}"]
+        if job_dir:
+            command += ["-s", f"JOBDIR={os.path.join(job_dir, f'shard-{shard_index}')}"]
+        commands.append(command + list(scrapy_args))
+    return commands
+
+
+def run_shards(commands: Sequence[Sequence[str]], logger: logging.Logger) -> int:
+    """
+    Starts a process per shard and waits for all of them to exit. A SIGTERM is forwarded
+    to the shards, a Ctrl-C reaches them directly as they run in the same process group.
+    :param commands: the ``scrapy crawl`` command of each shard
+    :param logger: `logging.Logger` object
+    :return: 0 if all the shards succeeded, else the exit code of a failed shard
+    """
+    processes = []
+    for command in commands:
+        logger.info("Starting shard %s: %s", len(processes), " ".join(command))
+        processes.append(subprocess.Popen(command))
+
+    def stop_shards(signum, frame) -> None:
+        logger.info("Stopping the shards")
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signum)
+
+    # Set after starting the shards, which would inherit the handlers otherwise
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, stop_shards)
+    exit_code = 0
+    for shard_index, process in enumerate(processes):
+        return_code = process.wait()
+        if return_code:
+            logger.error("Shard %s exited with code %s", shard_index, return_code)
+            exit_code = exit_code or return_code
+        else:
+            logger.info("Shard %s finished", shard_index)
+    return exit_code
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Parses the command line and runs the shards.
+    :param argv: command line arguments, `sys.argv` if None
+    :return: exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of the crawler processes, the number of cores by default",
+    )
+    parser.add_argument(
+        "scrapy_args", nargs="*", help="arguments of every scrapy crawl, given after --"
+    )
+    args = parser.parse_args(argv)
+    if args.shards < 1:
+        parser.error(f"--shards must be at least 1: {args.shards}")
+    config = get_config()
+    logger = logging.getLogger(name="news_scrapper.shards")
+    set_up_logging(
+        logger=logger, log_level=config.spider.log_level, file_name=config.spider.file_name
+    )
+    if not config.seen_index.enabled:
+        logger.warning("The seen URL index is disabled, the shards may store the same stories")
+    commands = shard_commands(
+        shard_count=args.shards, job_dir=config.spider.job_dir, scrapy_args=args.scrapy_args
+    )
+    return run_shards(commands=commands, logger=logger)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
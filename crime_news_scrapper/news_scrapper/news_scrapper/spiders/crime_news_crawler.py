@@ -18,20 +18,36 @@ Following things are important to crawl multiple websites simultaneously.
    is scrapy spider's attribute
 
 4. Create rules for what and how URLs should be scrapped
+
+5. To crawl with several processes, run :py:mod:`news_scrapper.shards`, which starts a
+   crawl per shard with ``-a shard_index=<index> -a shard_count=<count>``.
+
+6. To pause and resume a crawl, set `job_dir` in the `spider` section of the config (or
+   run ``scrapy crawl news_spider -s JOBDIR=<dir>``), stop the crawl with a single Ctrl-C
+   and run the same command again. The requests of the parsers are routed through the
+   :py:meth:`CrimeNewsSpider.dispatch` method, as only the requests with a callback of the
+   spider itself can be stored in the disk queues of the scheduler.
 """
 
 import logging
-import importlib
-from typing import Any, Union, Iterable
+from typing import Any, Iterable, Optional, Union
+from urllib.parse import urlparse
 
 from scrapy.spiders import CrawlSpider, Rule
 from scrapy.linkextractors import LinkExtractor
-from scrapy import Request
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
 from scrapy.item import Item
+from scrapy.settings import BaseSettings
+from twisted.python.failure import Failure
 
-from config import load_config, get_config_path
-from ..const import ParserType, ClassMapping
+from config import get_config
+from ..http_cache import cache_settings
 from ..log import set_up_logging
+from ..parsers.news_website_parser import NewsWebsiteParser
+from ..parsers.registry import ParserRegistry
+from ..seen_index import SeenUrlIndex
+from ..throttle import download_slots
 
 
 class CrimeNewsSpider(CrawlSpider):
@@ -45,71 +61,163 @@ class CrimeNewsSpider(CrawlSpider):
 
     name = "news_spider"
 
-    def __init__(self):
+    def __init__(self, *args: Any, shard_index: str = "0", shard_count: str = "1", **kwargs: Any):
         """
         Reads the config and initializes different rules for scrapping
         multiple websites.
+        :param shard_index: index of the shard to crawl in a sharded crawl, from 0
+        :param shard_count: number of the shards of a sharded crawl, 1 if not sharded
         """
-        super().__init__()
-        self.log = logging.getLogger()
+        super().__init__(*args, **kwargs)
+        self.log = logging.getLogger(name="news_scrapper.spider")
         self.rules_list = []
         # allow localhost in order to serve request for splash server running on localhost
         self.allowed_domains = ["localhost"]
-        config_path = get_config_path()
-        config = load_config(config_path=config_path)
-        self.config = config.get("spider", {})
-        self.sites = self.config.get("sites_to_crawl", [])
-        if not self.sites:
+        # The config is loaded and validated only once, before any network work
+        self.app_config = get_config()
+        self.config = self.app_config.spider
+        self.incremental_config = self.app_config.incremental
+        self.sites = self.config.sites_to_crawl
+        set_up_logging(
+            logger=self.log, log_level=self.config.log_level, file_name=self.config.file_name
+        )
+        # The spider arguments are strings, e.g. "-a shard_index=1 -a shard_count=4"
+        self.shard_index, self.shard_count = int(shard_index), int(shard_count)
+        if not 0 <= self.shard_index < self.shard_count:
             raise ValueError(
-                "No any sites to crawl, there should be at least one site to start a crawl"
+                f"shard_index must be between 0 and {self.shard_count - 1}: {shard_index}"
             )
-        log_level = self.config.get("log_level", "INFO")
-        log_path = self.config.get(
-            "file_name",
-            "crime_news_crawler.log",
-        )
-        set_up_logging(logger=self.log, log_level=log_level, file_name=log_path)
-        del self.config["log_level"]
-        del self.config["file_name"]
-        del self.config["sites_to_crawl"]
-        for domain, domain_config in self.config.items():
-            self.allowed_domains.append(domain)
+        # Persistent index of already stored story URLs, shared with the parsers and
+        # seeded from the database by the storage pipeline. The shards of a sharded crawl
+        # share it as well.
+        self.seen_index = None
+        if self.app_config.seen_index.enabled:
+            self.seen_index = SeenUrlIndex(
+                path=self.app_config.seen_index.path,
+                logger=self.log,
+                shared=self.shard_count > 1,
+            )
+            self.seen_index.open()
+        for site_config in self.config.sites:
+            self.allowed_domains.append(site_config.domain)
             # A list of URLs where the spider will begin to crawl from
-            self.start_urls.append(domain_config.get("start_url", ""))
+            self.start_urls.append(site_config.start_url)
             # Rules for crawling websites(how they can be crawled)
             # Allow only specific given URL. Avoid duplication and follow
             # the subequent URLs from that URL.
             self.rules_list.append(
                 Rule(
                     LinkExtractor(
-                        allow=(domain_config.get("allow", "")),
-                        unique=domain_config.get(
-                            "unique",
-                            True,
-                        ),
+                        allow=(site_config.allow),
+                        unique=site_config.unique,
                     ),
-                    follow=domain_config.get("follow", True),
+                    follow=site_config.follow,
                 ),
             )
         self.rules = tuple(self.rules_list)
+        # Resolve the parsers once, a single parser instance serves all the
+        # responses of its site.
+        self.registry = ParserRegistry(logger=self.log)
+        self.parsers = {site.lower(): self.get_parser(site=site) for site in self.sites}
+        if self.shard_count > 1:
+            self.assign_shard()
+        # Number of pending requests of an interrupted crawl resumed from the job directory
+        self.resumed_requests = 0
         self.log.info("Initiating crawl for %s", self.start_urls)
 
-    def get_parser(self, site: str) -> Any:
+    def assign_shard(self) -> None:
+        """
+        Splits the crawl among the shards of a sharded crawl. The listing pages of a site are
+        split among all the shards if its parser supports it, else the whole site is crawled
+        by a single shard.
+        """
+        for position, (site, parser) in enumerate(list(self.parsers.items())):
+            if parser.can_shard_pages():
+                parser.shard_index = self.shard_index
+                parser.shard_count = self.shard_count
+            elif position % self.shard_count != self.shard_index:
+                del self.parsers[site]
+        self.start_urls = [
+            url
+            for url in self.start_urls
+            if any(site in urlparse(url).netloc for site in self.parsers)
+        ]
+        self.log.info(
+            "Crawling shard %s of %s: %s",
+            self.shard_index + 1,
+            self.shard_count,
+            ", ".join(self.parsers),
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler, *args: Any, **kwargs: Any) -> "CrimeNewsSpider":
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(spider.request_dropped, signal=signals.request_dropped)
+        return spider
+
+    def spider_opened(self, spider: Spider) -> None:
+        """
+        Counts the pending requests which the scheduler resumed from the job directory,
+        before any of them is downloaded.
+        :param spider: `scrapy.Spider` object
+        """
+        self.resumed_requests = len(self.crawler.engine.slot.scheduler)
+
+    def request_dropped(self, request: Request, spider: Spider) -> None:
+        """
+        Tells the parser of a request that the scheduler dropped it, e.g. as a duplicate.
+        :param request: the dropped `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        site = request.cb_kwargs.get("site") if request.callback == self.dispatch else None
+        if site in self.parsers:
+            self.parsers[site].request_dropped(request=request)
+
+    @classmethod
+    def update_settings(cls, settings: BaseSettings) -> None:
+        """
+        Sets the download concurrency and delay of each type of requests of each site, the
+        job directory of a resumable crawl and the HTTP cache.
+        :param settings: `scrapy.settings.BaseSettings` object
+        """
+        super().update_settings(settings)
+        app_config = get_config()
+        config = app_config.spider
+        settings.set("DOWNLOAD_SLOTS", download_slots(sites=config.sites), priority="spider")
+        if config.job_dir:
+            settings.set("JOBDIR", config.job_dir, priority="spider")
+        settings.setdict(cache_settings(config=app_config.http_cache), priority="spider")
+
+    def get_parser(self, site: str) -> NewsWebsiteParser:
+        """
+        Returns the parser instance for a site from the parser registry and
+        configures it for this crawl
+        """
+        parser = self.registry.get(site=site)
+        parser.seen_index = self.seen_index
+        parser.incremental = self.incremental_config.enabled
+        parser.watermark_size = self.incremental_config.watermark_size
+        return parser
+
+    def start_requests(self) -> Iterable[Request]:
         """
-        Dynamically imports the parser class and returns its instance
+        Shares the pagination cursors of the spider state with the parsers before the crawl
+        starts. The state, along with the cursors, is persisted in the job directory and
+        loaded back by a resumed crawl. The pending requests of the interrupted crawl are
+        resumed from the job directory as well, along with its pagination requests, else the
+        parsers resume the pagination from the cursors.
+        :return: Iterable of `scrapy.http.Request` object for the `start_urls`
         """
-        try:
-            self.log.info("Initializing the parser for %s:", site)
-            parser_type = ClassMapping[ParserType[site.upper()].value].value
-            module_path, class_name = parser_type.rsplit(".", 1)
-            self.log.info("Importing the module %s:", class_name)
-            module = importlib.import_module(module_path)
-            cls = getattr(module, class_name)
-            return cls()
-        except ImportError as i_err:
-            raise ImportError(f"Unable to import module for {site}: {i_err}") from i_err
-        except Exception as err:
-            raise Exception(f"Instantiation failed for a parser: {site}: {err}") from err
+        # The state is persisted only when crawling with a JOBDIR, it is loaded back once the
+        # spider is opened
+        if hasattr(self, "state"):
+            cursors = self.state.setdefault("cursors", {})
+            for parser in self.parsers.values():
+                parser.cursors = cursors
+                if not self.resumed_requests:
+                    parser.resume_from = cursors.get(parser.source)
+        yield from super().start_requests()
 
     def parse_start_url(
         self, response, **kwargs
@@ -123,19 +231,60 @@ class CrimeNewsSpider(CrawlSpider):
         :param response: py:class:`scrapy.http.response.TextResponse` object
         ::return: `scrapy.http.Request` or `scrapy.Item` object or its iterable
         """
-        domain = response.url.split("//")[1].split(".")[1]
-        if ParserType.INDIATODAY.name.lower() in domain:
-            if ParserType.INDIATODAY.name.lower() in self.sites:
-                self.india_today = self.get_parser(site=ParserType.INDIATODAY.name)
-                self.india_today.CLICKS += 1
+        domain = urlparse(response.url).netloc
+        for site, parser in self.parsers.items():
+            if site in domain:
+                parser.CLICKS += 1
                 self.log.info("Started crawling front page for %s", response.url)
-                yield from self.india_today.parse_front_page(response=response)
-        if ParserType.INDIANEXPRESS.name.lower() in response.url:
-            if ParserType.INDIANEXPRESS.name.lower() in self.sites:
-                self.indian_express = self.get_parser(site=ParserType.INDIANEXPRESS.name)
-                self.indian_express.CLICKS += 1
-                self.log.info("Started crawling front page for %s", response.url)
-                yield from self.indian_express.parse_front_page(response=response)
+                yield from self.route(site=site, outputs=parser.parse_front_page(response=response))
+
+    def dispatch(
+        self, response, site: str, callback: str, errback: Optional[str] = None, **kwargs: Any
+    ) -> Iterable[Union[Request, Item]]:
+        """
+        Callback of all the requests made by the parsers, runs the callback of the parser.
+        :param response: py:class:`scrapy.http.response.TextResponse` object
+        :param site: name of the site of the parser, as in `sites_to_crawl`
+        :param callback: name of the callback method of the parser
+        :param errback: name of the errback method of the parser, run by
+            :py:meth:`dispatch_error`
+        :param kwargs: keyword arguments of the parser callback
+        ::return: Iterable of `scrapy.http.Request` or `scrapy.Item` object
+        """
+        parser = self.parsers[site]
+        yield from self.route(site=site, outputs=getattr(parser, callback)(response, **kwargs))
+
+    def dispatch_error(self, failure: Failure) -> Iterable[Union[Request, Item]]:
+        """
+        Errback of the requests made by the parsers with an errback, runs the errback of
+        the parser.
+        :param failure: `twisted.python.failure.Failure` of the request
+        ::return: Iterable of `scrapy.http.Request` or `scrapy.Item` object
+        """
+        site = failure.request.cb_kwargs["site"]
+        errback = getattr(self.parsers[site], failure.request.cb_kwargs["errback"])
+        yield from self.route(site=site, outputs=errback(failure))
+
+    def route(self, site: str, outputs: Iterable[Any]) -> Iterable[Union[Request, Item]]:
+        """
+        Routes the requests of a parser through :py:meth:`dispatch` (and their errors through
+        :py:meth:`dispatch_error`), with the names of the parser callback and errback in their
+        `cb_kwargs`, so that they can be serialized to a disk queue.
+        :param site: name of the site of the parser, as in `sites_to_crawl`
+        :param outputs: requests and items yielded by a parser callback
+        ::return: Iterable of `scrapy.http.Request` or `scrapy.Item` object
+        """
+        for output in outputs or ():
+            if (
+                isinstance(output, Request)
+                and getattr(output.callback, "__self__", None) is self.parsers[site]
+            ):
+                output.cb_kwargs.update(site=site, callback=output.callback.__name__)
+                output.callback = self.dispatch
+                if getattr(output.errback, "__self__", None) is self.parsers[site]:
+                    output.cb_kwargs.update(errback=output.errback.__name__)
+                    output.errback = self.dispatch_error
+            yield output
 
     def closed(self, reason) -> None:
         """
@@ -144,6 +293,17 @@ class CrimeNewsSpider(CrawlSpider):
         :param reason: a string describing the spider closure reason
         """
         self.log.info("Closing the spider with reason as: %s", reason)
-        self.indian_express.logger.info(f"Total web page clicks: {self.indian_express.CLICKS}")
-        self.india_today.logger.info(f"Total Load more clicks: {self.india_today.LOAD_MORE_CLICKS}")
-        self.india_today.logger.info(f"Total web page clicks: {self.india_today.CLICKS}")
+        # A finished crawl has nothing to resume, the next one paginates from the start
+        if reason == "finished" and hasattr(self, "state"):
+            self.state.pop("cursors", None)
+        if self.seen_index is not None:
+            self.seen_index.close()
+        for parser in self.parsers.values():
+            parser.logger.info(f"Total Load more clicks: {parser.LOAD_MORE_CLICKS}")
+            parser.logger.info(f"Total web page clicks: {parser.CLICKS}")
+            parser.logger.info(
+                f"Stories complete from the listings, without a story page: "
+                f"{parser.complete_listings}"
+            )
+            if getattr(parser, "extracted", None):
+                parser.logger.info(f"Listings extracted per method: {parser.extracted}")
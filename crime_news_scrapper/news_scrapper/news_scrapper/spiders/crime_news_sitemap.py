@@ -0,0 +1,257 @@
+"""
+Sitemap spider discovers the crime stories from the news sitemaps and the RSS feeds of the
+sites, instead of paginating their listing pages. A sitemap or a feed lists the URLs of the
+newest stories along with the time they were modified, so a run needs only a request or two
+to find all the new stories and then downloads only those.
+
+How To Use This Module
+======================
+
+This class will be actually called/instantiated by scrapy framework, start a crawl with
+``scrapy crawl news_sitemap_spider``.
+
+Following things are configured per site in the `spider` section of the config.
+
+1. `sitemap_url` is the news sitemap or the robots.txt listing the sitemaps, of which only
+   the sitemaps matching `sitemap_follow` are read
+
+2. `feed_url` is the RSS feed of the site, if any
+
+3. `sitemap_allow` selects the crime stories by their URLs, `allow` is used if empty
+
+4. The stories already stored are skipped
+"""
+
+import logging
+import re
+from typing import Any, Callable, Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+from scrapy import Request
+from scrapy.http import TextResponse
+from scrapy.settings import BaseSettings
+from scrapy.spiders import SitemapSpider
+from scrapy.utils.sitemap import sitemap_urls_from_robots
+
+from config import SiteConfig, get_config
+from ..const import RequestType
+from ..http_cache import cache_settings
+from ..log import set_up_logging
+from ..parsers.news_website_parser import NewsWebsiteParser
+from ..parsers.registry import ParserRegistry
+from ..seen_index import SeenUrlIndex
+from ..throttle import download_slots
+
+
+class CrimeNewsSitemapSpider(SitemapSpider):
+    """
+    Initializes a :py:class:`CrimeNewsSitemapSpider` object.
+    Defines a custom behaviour for discovering the stories of different crime websites
+    from their sitemaps and feeds with the help of in built scrapy sitemap spider
+
+    ::return: a new :py:class:`CrimeNewsSitemapSpider` object
+    """
+
+    name = "news_sitemap_spider"
+
+    def __init__(self, *args, **kwargs):
+        """
+        Reads the config and initializes the sitemap rules of the sites to crawl, the
+        stories matching the rule of a site are parsed by the parser of the site.
+        """
+        self.log = logging.getLogger(name="news_scrapper.sitemap_spider")
+        self.app_config = get_config()
+        self.config = self.app_config.spider
+        self.incremental_config = self.app_config.incremental
+        set_up_logging(
+            logger=self.log, log_level=self.config.log_level, file_name=self.config.file_name
+        )
+        # Index of already stored story URLs, seeded from the database by the storage pipeline
+        self.seen_index = None
+        if self.app_config.seen_index.enabled:
+            self.seen_index = SeenUrlIndex(path=self.app_config.seen_index.path, logger=self.log)
+            self.seen_index.open()
+        self.registry = ParserRegistry(logger=self.log)
+        self.allowed_domains = []
+        self.sitemap_urls = []
+        self.sitemap_rules = []
+        self.sitemap_follow = []
+        self.feed_urls = []
+        self.parsers = {}
+        for site_config in self.config.sites:
+            site = self.site_name(site_config=site_config)
+            if site is None or not (site_config.sitemap_url or site_config.feed_url):
+                continue
+            self.parsers[site] = self.get_parser(site=site)
+            self.allowed_domains.append(site_config.domain)
+            if site_config.sitemap_url:
+                self.sitemap_urls.append(site_config.sitemap_url)
+                self.sitemap_follow.append(site_config.sitemap_follow)
+            if site_config.feed_url:
+                self.feed_urls.append(site_config.feed_url)
+            pattern = site_config.sitemap_allow or site_config.allow or re.escape(site)
+            self.sitemap_rules.append((re.compile(pattern), self.parsers[site].parse_article))
+        super().__init__(*args, **kwargs)
+        self.log.info("Initiating discovery from %s", self.sitemap_urls + self.feed_urls)
+
+    def site_name(self, site_config: SiteConfig) -> Optional[str]:
+        """
+        :param site_config: `SiteConfig` object
+        :return: the name of the site in `sites_to_crawl` or None if not to be crawled
+        """
+        for site in self.config.sites_to_crawl:
+            if site.lower() in site_config.domain:
+                return site.lower()
+        return None
+
+    @classmethod
+    def update_settings(cls, settings: BaseSettings) -> None:
+        """
+        Sets the download concurrency and delay of each type of requests of each site and
+        the HTTP cache.
+        :param settings: `scrapy.settings.BaseSettings` object
+        """
+        super().update_settings(settings)
+        app_config = get_config()
+        settings.set(
+            "DOWNLOAD_SLOTS", download_slots(sites=app_config.spider.sites), priority="spider"
+        )
+        settings.setdict(cache_settings(config=app_config.http_cache), priority="spider")
+
+    def get_parser(self, site: str) -> NewsWebsiteParser:
+        """
+        Returns the parser instance for a site from the parser registry and
+        configures it for this crawl
+        """
+        parser = self.registry.get(site=site)
+        parser.seen_index = self.seen_index
+        parser.incremental = self.incremental_config.enabled
+        parser.watermark_size = self.incremental_config.watermark_size
+        return parser
+
+    def start_requests(self) -> Iterable[Request]:
+        """
+        :return: requests for the sitemaps, the robots.txt files and the feeds of the sites
+        """
+        meta = {"request_type": RequestType.FEED.value}
+        for url in self.sitemap_urls:
+            if url.endswith("/robots.txt"):
+                yield Request(url=url, callback=self.parse_robots, meta=meta)
+            else:
+                yield Request(url=url, callback=self.parse_sitemap, meta=meta)
+        for url in self.feed_urls:
+            yield Request(url=url, callback=self.parse_feed, meta=meta)
+
+    def parse_robots(self, response: TextResponse) -> Iterable[Request]:
+        """
+        Requests only the sitemaps listed in a robots.txt which match `sitemap_follow`,
+        as the sites list their whole archive there as well.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: Iterable of `scrapy.http.Request` object
+        """
+        for url in sitemap_urls_from_robots(response.text, base_url=response.url):
+            if any(re.search(pattern, url) for pattern in self.sitemap_follow):
+                yield Request(
+                    url=url,
+                    callback=self.parse_sitemap,
+                    meta={"request_type": RequestType.FEED.value},
+                )
+
+    def parse_sitemap(self, response: TextResponse) -> Iterable[Request]:
+        """
+        Parses a sitemap with the scrapy sitemap spider and sets the request type of the
+        requests for the sitemaps and the stories in it.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: Iterable of `scrapy.http.Request` object
+        """
+        for request in self._parse_sitemap(response):
+            if request.callback == self._parse_sitemap:
+                yield request.replace(
+                    callback=self.parse_sitemap, meta={"request_type": RequestType.FEED.value}
+                )
+            else:
+                yield request.replace(meta=self.story_meta(url=request.url))
+
+    def parser_for(self, url: str) -> Optional[NewsWebsiteParser]:
+        """
+        :param url: url of a story or of a sitemap
+        :return: parser of the site of the url or None if not a site to crawl
+        """
+        domain = urlparse(url).netloc
+        for site, parser in self.parsers.items():
+            if site in domain:
+                return parser
+        return None
+
+    def story_meta(self, url: str) -> dict[str, Any]:
+        """
+        :param url: url of a story
+        :return: meta of the request for the story page
+        """
+        parser = self.parser_for(url)
+        return {
+            "request_type": RequestType.STORY.value,
+            "stop_download_after": parser.article_page_patterns() if parser else (),
+        }
+
+    def sitemap_filter(self, entries: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """
+        Skips the sitemap (and feed) entries of the stories already stored. The `lastmod` of
+        an entry is not compared with the last crawl, as a story modified before it may still
+        be missing from the listing crawled then.
+        :param entries: dicts of the `loc` and the optional `lastmod` of the entries
+        :return: iterator of the entries to request
+        """
+        skipped = 0
+        for entry in entries:
+            parser = self.parser_for(entry["loc"])
+            if parser is None:
+                yield entry
+                continue
+            if parser.is_known(entry["loc"]):
+                skipped += 1
+                continue
+            yield entry
+        if skipped:
+            self.log.info("Skipped %s already stored entries", skipped)
+
+    def callback_for(self, url: str) -> Optional[Callable]:
+        """
+        :param url: url of a story
+        :return: callback of the first sitemap rule matching the url, None if none matches
+        """
+        for pattern, callback in self.sitemap_rules:
+            if pattern.search(url):
+                return callback
+        return None
+
+    def parse_feed(self, response: TextResponse) -> Iterable[Request]:
+        """
+        Requests the stories of an RSS feed, filtered the same as the sitemap entries.
+        :param response: An instance of `scrapy.http.TextResponse`
+        :return: Iterable of `scrapy.http.Request` object
+        """
+        response.selector.remove_namespaces()
+        entries = [
+            {"loc": (item.xpath("./link/text()").get() or "").strip()}
+            for item in response.xpath("//item")
+        ]
+        self.log.info("Read %s entries from the feed %s", len(entries), response.url)
+        for entry in self.sitemap_filter(entry for entry in entries if entry["loc"]):
+            callback = self.callback_for(entry["loc"])
+            if callback is not None:
+                yield Request(
+                    url=entry["loc"], callback=callback, meta=self.story_meta(url=entry["loc"])
+                )
+
+    def closed(self, reason) -> None:
+        """
+        Called when the spider closes. This method provides a shortcut to
+        signals.connect() for the spider_closed signal.
+        :param reason: a string describing the spider closure reason
+        """
+        self.log.info("Closing the spider with reason as: %s", reason)
+        if self.seen_index is not None:
+            self.seen_index.close()
+        for parser in self.parsers.values():
+            parser.logger.info(f"Total web page clicks: {parser.CLICKS}")
@@ -0,0 +1,272 @@
+"""
+This module provides the download slot profiles of the sites and an adaptive throttle which
+tunes them from the measured latency and error rate.
+
+Every type of requests of a site (see :py:class:`RequestType`) is downloaded in its own
+download slot, e.g. `indiatoday.in:ajax`, with the concurrency, the delay and the timeout
+configured in the `download_slots` of the site, so the slow Splash renders do not hold back
+the fast AJAX calls. The :py:class:`AdaptiveThrottle` extension replaces the Scrapy
+AutoThrottle: the delay of a slot follows its latency as with AutoThrottle, but never drops
+below the configured delay, and the concurrency of a slot is increased by one while the slot
+keeps up, decreased by one once its latency grows and halved once its requests fail, within
+the configured bounds.
+
+How To Use This Module
+======================
+
+Enable the middleware and the extension in the scrapy settings::
+
+    DOWNLOADER_MIDDLEWARES = {"news_scrapper.throttle.DownloadSlotMiddleware": 700}
+    EXTENSIONS = {
+        "scrapy.extensions.throttle.AutoThrottle": None,
+        "news_scrapper.throttle.AdaptiveThrottle": 0,
+    }
+    AUTOTHROTTLE_ENABLED = True
+
+and set the `DOWNLOAD_SLOTS` setting of a spider from the config::
+
+    settings.set("DOWNLOAD_SLOTS", download_slots(sites=get_config().spider.sites))
+"""
+
+from dataclasses import dataclass
+import logging
+from typing import Iterable
+from urllib.parse import urlparse
+
+from scrapy import Request, Spider, signals
+from scrapy.core.downloader import Slot
+from scrapy.crawler import Crawler
+from scrapy.extensions.throttle import AutoThrottle
+from scrapy.http import Response
+
+from config import DownloadSlotConfig, SiteConfig, get_config
+from news_scrapper.const import RequestType
+from news_scrapper.log import set_up_logging
+
+# Responses with these statuses mean that the site is overloaded or throttling the crawl
+ERROR_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+def slot_key(domain: str, request_type: str) -> str:
+    """
+    :param domain: domain of a site, as in the `spider` section of the config
+    :param request_type: value of a :py:class:`RequestType`
+    :return: name of the download slot of the type of requests of the site
+    """
+    return f"{domain}:{request_type}"
+
+
+def request_type(request: Request) -> str:
+    """
+    :param request: `scrapy.Request` object
+    :return: value of the :py:class:`RequestType` of the request, "listing" if not set
+    """
+    if "splash" in request.meta:
+        return RequestType.SPLASH.value
+    return request.meta.get("request_type", RequestType.LISTING.value)
+
+
+def download_slots(sites: Iterable[SiteConfig]) -> dict[str, dict]:
+    """
+    :param sites: configs of the sites
+    :return: the `DOWNLOAD_SLOTS` setting, the concurrency and delay of each download slot
+    """
+    return {
+        slot_key(site.domain, slot.request_type): {
+            "concurrency": slot.concurrency,
+            "delay": slot.delay,
+        }
+        for site in sites
+        for slot in site.download_slots
+    }
+
+
+class DownloadSlotMiddleware:
+    """
+    Initializes a :py:class:`DownloadSlotMiddleware` object.
+    Downloader middleware assigning the requests of the configured sites to the download slot
+    of their type. It must run before the Splash middleware, which keeps the assigned slot.
+
+    ::return: a new :py:class:`DownloadSlotMiddleware` object
+    """
+
+    def __init__(self, sites: Iterable[SiteConfig]):
+        """
+        :param sites: configs of the sites
+        """
+        self.slots = {
+            site.domain: {slot.request_type: slot for slot in site.download_slots} for site in sites
+        }
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "DownloadSlotMiddleware":
+        return cls(sites=get_config().spider.sites)
+
+    def process_request(self, request: Request, spider: Spider) -> None:
+        """
+        Sets the `download_slot` of a request of a site with a download slot for its type,
+        and the `download_timeout` if the slot has one.
+        :param request: `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        if "download_slot" in request.meta:
+            return None
+        slot_type = request_type(request)
+        hostname = urlparse(request.url).hostname or ""
+        for domain, slots in self.slots.items():
+            if hostname.endswith(domain) and slot_type in slots:
+                request.meta["download_slot"] = slot_key(domain, slot_type)
+                if slots[slot_type].timeout:
+                    request.meta.setdefault("download_timeout", slots[slot_type].timeout)
+                break
+        return None
+
+
+@dataclass
+class SlotWindow:
+    """Responses of a download slot since its concurrency was last adjusted"""
+
+    finished: int = 0
+    responses: int = 0
+    errors: int = 0
+    latency: float = 0.0
+    # Whether requests were waiting for the slot, i.e. a higher concurrency would be used
+    saturated: bool = False
+
+
+class AdaptiveThrottle(AutoThrottle):
+    """
+    Initializes a :py:class:`AdaptiveThrottle` object.
+    AutoThrottle extension which adjusts the delay of the configured download slots to their
+    latency and their concurrency, and tunes the concurrency from the latency and the error rate.
+
+    ::return: a new :py:class:`AdaptiveThrottle` object
+    """
+
+    def __init__(self, crawler: Crawler):
+        """
+        :param crawler: `scrapy.crawler.Crawler` object
+        """
+        super().__init__(crawler)
+        app_config = get_config()
+        self.config = app_config.throttle
+        self.log = logging.getLogger(name="news_scrapper.throttle")
+        set_up_logging(
+            logger=self.log,
+            log_level=app_config.spider.log_level,
+            file_name=app_config.spider.file_name,
+        )
+        self.profiles: dict[str, DownloadSlotConfig] = {
+            slot_key(site.domain, slot.request_type): slot
+            for site in app_config.spider.sites
+            for slot in site.download_slots
+        }
+        self.windows: dict[str, SlotWindow] = {}
+        # Lowest mean latency of each slot, the latency it is compared with
+        self.base_latencies: dict[str, float] = {}
+        crawler.signals.connect(
+            self._request_left_downloader, signal=signals.request_left_downloader
+        )
+
+    def _response_downloaded(self, response: Response, request: Request, spider: Spider) -> None:
+        """
+        Adjusts the delay of the slot of a response and records its latency and status.
+        :param response: `scrapy.http.Response` object
+        :param request: `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        key, slot = self._get_slot(request, spider)
+        profile = self.profiles.get(key)
+        if profile is None or slot is None:
+            super()._response_downloaded(response, request, spider)
+            return
+        latency = request.meta.get("download_latency")
+        if latency is None:
+            return
+        self.adjust_delay(slot=slot, profile=profile, latency=latency, response=response)
+        window = self.windows.setdefault(key, SlotWindow())
+        window.responses += 1
+        window.latency += latency
+        window.errors += response.status in ERROR_STATUSES
+        window.saturated = window.saturated or bool(slot.queue)
+
+    def adjust_delay(
+        self, slot: Slot, profile: DownloadSlotConfig, latency: float, response: Response
+    ) -> None:
+        """
+        Sets the delay of a slot so that a request is sent every `latency / concurrency`
+        seconds, as AutoThrottle does for its target concurrency, but not more often than
+        the configured delay of the slot.
+        :param slot: download slot
+        :param profile: config of the download slot
+        :param latency: download latency of the response, in seconds
+        :param response: `scrapy.http.Response` object
+        """
+        target_delay = latency / slot.concurrency
+        new_delay = max(target_delay, (slot.delay + target_delay) / 2.0)
+        new_delay = min(max(profile.delay, new_delay), self.maxdelay)
+        # Error pages are usually fast, they must not reduce the delay
+        if response.status != 200 and new_delay <= slot.delay:
+            return
+        slot.delay = new_delay
+
+    def _request_left_downloader(self, request: Request, spider: Spider) -> None:
+        """
+        Counts the finished requests of a slot, successful or not, and adjusts the
+        concurrency of the slot once per window of finished requests.
+        :param request: `scrapy.Request` object
+        :param spider: `scrapy.Spider` object
+        """
+        key, slot = self._get_slot(request, spider)
+        profile = self.profiles.get(key)
+        if profile is None or slot is None:
+            return
+        window = self.windows.setdefault(key, SlotWindow())
+        window.finished += 1
+        if window.finished >= max(self.config.window, slot.concurrency):
+            if self.config.adaptive:
+                self.adjust_concurrency(key=key, slot=slot, profile=profile, window=window)
+            self.windows[key] = SlotWindow()
+
+    def adjust_concurrency(
+        self, key: str, slot: Slot, profile: DownloadSlotConfig, window: SlotWindow
+    ) -> None:
+        """
+        Halves the concurrency of a slot when too many of its requests failed, decreases it
+        by one when its latency grew and increases it by one when requests waited for it.
+        :param key: name of the download slot
+        :param slot: download slot
+        :param profile: config of the download slot
+        :param window: responses of the slot since its concurrency was last adjusted
+        """
+        # The requests which left the downloader without a response failed as well
+        error_rate = (window.errors + window.finished - window.responses) / window.finished
+        latency = window.latency / window.responses if window.responses else None
+        base_latency = self.base_latencies.get(key)
+        concurrency = slot.concurrency
+        if error_rate > self.config.max_error_rate:
+            concurrency = max(profile.min_concurrency, concurrency // 2)
+        elif (
+            latency is not None
+            and base_latency is not None
+            and latency > base_latency * self.config.latency_tolerance
+        ):
+            concurrency = max(profile.min_concurrency, concurrency - 1)
+        elif window.saturated:
+            concurrency = min(profile.max_concurrency, concurrency + 1)
+        if latency is not None:
+            # The base latency rises by at most 10% per window, so that a site which became
+            # slower for good does not keep decreasing the concurrency down to its minimum
+            self.base_latencies[key] = (
+                latency if base_latency is None else min(latency, base_latency * 1.1)
+            )
+        if concurrency != slot.concurrency:
+            self.log.info(
+                "Changing the concurrency of %s from %s to %s (latency %.2fs, errors %.0f%%)",
+                key,
+                slot.concurrency,
+                concurrency,
+                latency or 0.0,
+                error_rate * 100,
+            )
+            slot.concurrency = concurrency